@@ -0,0 +1,71 @@
+import gzip
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает HTML-страницы и их аналоги в JSON API: время ответа, '
+        'число запросов и размер до и после gzip.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз запрашивать каждую страницу.'
+        )
+
+    def measure(self, client, url, repeat):
+        timings = []
+        for _ in range(repeat):
+            # Сравниваем генерацию ответа, а не кэш лент.
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                start = perf_counter()
+                response = client.get(url)
+                timings.append(perf_counter() - start)
+        content = response.content
+        return (
+            min(timings) * 1000, len(queries),
+            len(content), len(gzip.compress(content))
+        )
+
+    def handle(self, *args, **options):
+        post = Post.objects.select_related('author', 'group').filter(
+            group__isnull=False
+        ).first()
+        if post is None:
+            raise CommandError('Нужен хотя бы один пост с группой.')
+        group = Group.objects.get(pk=post.group_id)
+        username = post.author.username
+        pages = (
+            ('index', reverse('posts:index'), reverse('api:posts')),
+            ('group', reverse('posts:group_list', args=[group.slug]),
+             reverse('api:group_posts', args=[group.slug])),
+            ('profile', reverse('posts:profile', args=[username]),
+             reverse('api:profile_posts', args=[username])),
+            ('post', reverse('posts:post_detail', args=[post.pk]),
+             reverse('api:post_detail', args=[post.pk])),
+        )
+        client = Client()
+        self.stdout.write(
+            f'{"page":>8} {"kind":>5} {"ms":>8} {"queries":>8} '
+            f'{"bytes":>8} {"gzip":>8}'
+        )
+        for name, *urls in pages:
+            for kind, url in zip(('html', 'json'), urls):
+                ms, queries, size, packed = self.measure(
+                    client, url, options['repeat']
+                )
+                self.stdout.write(
+                    f'{name:>8} {kind:>5} {ms:>8.2f} {queries:>8} '
+                    f'{size:>8} {packed:>8}'
+                )
@@ -0,0 +1,43 @@
+from posts.constants import api_max_limit, limitation
+from posts.utils import CursorPaginator
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', limitation))
+    except ValueError:
+        limit = limitation
+    return max(1, min(limit, api_max_limit))
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def cursor_page(request, queryset, key=None):
+    """Keyset-страница по дате и id, как в HTML-лентах."""
+    paginator = CursorPaginator(queryset, get_limit(request), key=key)
+    page = paginator.cursor_page(request.GET.get('cursor'))
+    return list(page), {
+        'next': page_url(request, paginator.next_cursor),
+        'previous': page_url(request, paginator.previous_cursor),
+    }
+
+
+def id_page(request, queryset):
+    """Страница по возрастанию id для списков без даты."""
+    limit = get_limit(request)
+    try:
+        after = int(request.GET.get('cursor', 0))
+    except ValueError:
+        after = 0
+    rows = list(queryset.filter(pk__gt=after).order_by('pk')[:limit + 1])
+    next_cursor = str(rows[limit - 1].pk) if len(rows) > limit else None
+    return rows[:limit], {
+        'next': page_url(request, next_cursor),
+        'previous': None,
+    }
@@ -0,0 +1,134 @@
+from collections import namedtuple
+
+from posts.counters import stats_for
+
+# getter строит значение по объекту, columns — поля для only(),
+# related — пути для select_related.
+Field = namedtuple('Field', ('getter', 'columns', 'related'))
+
+
+def field(getter, *columns, related=()):
+    return Field(getter, columns, related)
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+class Serializer:
+    """
+    Превращает объекты в словари с выбранным набором полей (?fields=).
+    Из базы читаются только колонки и связи, нужные этим полям.
+    """
+    fields = {}
+    # Поля, которые всегда читаются из базы, например ключ паджинации.
+    required = ('id',)
+
+    def __init__(self, names=None):
+        if names:
+            names = [name.strip() for name in names.split(',')]
+            unknown = [name for name in names if name not in self.fields]
+            if unknown:
+                raise InvalidFields(
+                    'Неизвестные поля: ' + ', '.join(unknown)
+                )
+        else:
+            names = list(self.fields)
+        self.names = names
+
+    def prepare(self, queryset):
+        columns = set(self.required)
+        related = set()
+        for name in self.names:
+            columns.update(self.fields[name].columns)
+            related.update(self.fields[name].related)
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+    def __call__(self, obj):
+        return {name: self.fields[name].getter(obj) for name in self.names}
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': field(lambda post: post.pk, 'id'),
+        'text': field(lambda post: post.text, 'text'),
+        'pub_date': field(lambda post: post.pub_date, 'pub_date'),
+        'updated': field(lambda post: post.updated, 'updated'),
+        'author': field(
+            lambda post: post.author.username,
+            'author', 'author__username', related=('author',)
+        ),
+        'group': field(
+            lambda post: post.group.slug if post.group_id else None,
+            'group', 'group__slug', related=('group',)
+        ),
+        'image': field(
+            lambda post: post.image.url if post.image else None, 'image'
+        ),
+        'comments_count': field(
+            lambda post: post.comments_count, 'comments_count'
+        ),
+    }
+    required = ('id', 'pub_date')
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'id': field(lambda group: group.pk, 'id'),
+        'slug': field(lambda group: group.slug, 'slug'),
+        'title': field(lambda group: group.title, 'title'),
+        'description': field(lambda group: group.description, 'description'),
+    }
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': field(lambda comment: comment.pk, 'id'),
+        'post': field(lambda comment: comment.post_id, 'post'),
+        'author': field(
+            lambda comment: comment.author.username,
+            'author', 'author__username', related=('author',)
+        ),
+        'text': field(lambda comment: comment.text, 'text'),
+        'created': field(lambda comment: comment.created, 'created'),
+    }
+    required = ('id', 'created')
+
+
+class FollowSerializer(Serializer):
+    fields = {
+        'id': field(lambda follow: follow.pk, 'id'),
+        'user': field(
+            lambda follow: follow.user.username,
+            'user', 'user__username', related=('user',)
+        ),
+        'author': field(
+            lambda follow: follow.author.username,
+            'author', 'author__username', related=('author',)
+        ),
+    }
+
+
+class ProfileSerializer(Serializer):
+    fields = {
+        'id': field(lambda user: user.pk, 'id'),
+        'username': field(lambda user: user.username, 'username'),
+        'full_name': field(
+            lambda user: user.get_full_name(), 'first_name', 'last_name'
+        ),
+        'posts_count': field(
+            lambda user: stats_for(user).posts_count,
+            'stats__posts_count', related=('stats',)
+        ),
+        'followers_count': field(
+            lambda user: stats_for(user).followers_count,
+            'stats__followers_count', related=('stats',)
+        ),
+        'following_count': field(
+            lambda user: stats_for(user).following_count,
+            'stats__following_count', related=('stats',)
+        ),
+    }
@@ -0,0 +1,113 @@
+import gzip
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='api_author')
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+            for i in range(15)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_json(self, url, client=None, **params):
+        response = (client or self.client).get(url, params)
+        return response.status_code, json.loads(response.content)
+
+    def test_cursor_pagination(self):
+        """Списки листаются курсором до конца без повторов."""
+        for client, url in (
+            (self.client, reverse('api:posts')),
+            (self.client, reverse('api:group_posts', args=['api'])),
+            (self.client, reverse('api:profile_posts', args=['api_author'])),
+            (self.reader_client, reverse('api:follow_index')),
+        ):
+            with self.subTest(url=url):
+                _, data = self.get_json(url, client)
+                self.assertEqual(len(data['results']), 10)
+                self.assertIsNone(data['previous'])
+                response = client.get(data['next'])
+                rest = json.loads(response.content)
+                self.assertEqual(len(rest['results']), 5)
+                self.assertIsNone(rest['next'])
+                ids = [post['id'] for post in data['results']]
+                ids += [post['id'] for post in rest['results']]
+                self.assertEqual(ids, [post.pk for post in self.posts][::-1])
+
+    def test_sparse_fieldsets(self):
+        """Параметр fields оставляет в ответе только указанные поля."""
+        _, data = self.get_json(reverse('api:posts'), fields='id,author')
+        self.assertEqual(
+            data['results'][0],
+            {'id': self.posts[-1].pk, 'author': 'api_author'}
+        )
+        status, data = self.get_json(reverse('api:posts'), fields='id,secret')
+        self.assertEqual(status, 400)
+
+    def test_details(self):
+        """Пост, группа, профиль и комментарии отдаются в JSON."""
+        post = self.posts[0]
+        _, data = self.get_json(reverse('api:post_detail', args=[post.pk]))
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['group'], 'api')
+        self.assertEqual(data['comments_count'], 1)
+        _, data = self.get_json(reverse('api:post_comments', args=[post.pk]))
+        self.assertEqual(data['results'][0]['author'], 'api_reader')
+        _, data = self.get_json(reverse('api:group_detail', args=['api']))
+        self.assertEqual(data['title'], 'Группа')
+        _, data = self.get_json(reverse('api:groups'))
+        self.assertEqual(data['results'][0]['slug'], 'api')
+        _, data = self.get_json(reverse('api:profile', args=['api_author']))
+        self.assertEqual(data['posts_count'], 15)
+        self.assertEqual(data['followers_count'], 1)
+        _, data = self.get_json(reverse('api:follows'), self.reader_client)
+        self.assertEqual(data['results'][0]['author'], 'api_author')
+
+    def test_errors(self):
+        """Ошибки тоже отдаются в JSON."""
+        status, _ = self.get_json(reverse('api:post_detail', args=[0]))
+        self.assertEqual(status, 404)
+        status, _ = self.get_json(reverse('api:follow_index'))
+        self.assertEqual(status, 401)
+        response = self.client.post(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_bounded_queries(self):
+        """Число запросов не зависит от размера страницы."""
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api:posts'), {'limit': 100})
+        with self.assertNumQueries(2):
+            self.client.get(reverse('api:group_posts', args=['api']))
+
+    def test_gzip(self):
+        """Ответ сжимается, если клиент это поддерживает."""
+        response = self.client.get(
+            reverse('api:posts'), {'limit': 15}, HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data['results']), 15)
@@ -0,0 +1,123 @@
+from functools import wraps
+
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+
+from core.queries import query_budget
+from posts.models import Group, Post, User
+from posts.timeline import TIMELINE_KEY, get_timeline
+
+from .pagination import cursor_page, id_page
+from .serializers import (CommentSerializer, FollowSerializer,
+                          GroupSerializer, InvalidFields, PostSerializer,
+                          ProfileSerializer)
+
+# Без пробелов и с кириллицей как есть: ответ меньше и лучше жмется.
+COMPACT = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def error(message, status):
+    return JsonResponse(
+        {'error': message}, status=status, json_dumps_params=COMPACT
+    )
+
+
+def api_view(budget, login_required=False):
+    """Оборачивает view, возвращающий словарь, в JSON-ответ."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if login_required and not request.user.is_authenticated:
+                return error('Требуется авторизация', 401)
+            try:
+                data = view(request, *args, **kwargs)
+            except Http404:
+                return error('Не найдено', 404)
+            except InvalidFields as exc:
+                return error(str(exc), 400)
+            if isinstance(data, HttpResponse):
+                return data
+            return JsonResponse(data, json_dumps_params=COMPACT)
+        return query_budget(budget)(require_GET(gzip_page(wrapper)))
+    return decorator
+
+
+def listing(request, queryset, serializer_class, key=None):
+    serializer = serializer_class(request.GET.get('fields'))
+    rows, links = cursor_page(request, serializer.prepare(queryset), key)
+    return {'results': [serializer(row) for row in rows], **links}
+
+
+def detail(request, queryset, serializer_class, **lookup):
+    serializer = serializer_class(request.GET.get('fields'))
+    return serializer(
+        get_object_or_404(serializer.prepare(queryset), **lookup)
+    )
+
+
+@api_view(1)
+def posts(request):
+    return listing(request, Post.objects.all(), PostSerializer)
+
+
+@api_view(1)
+def post_detail(request, post_id):
+    return detail(request, Post.objects.all(), PostSerializer, id=post_id)
+
+
+@api_view(2)
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    return listing(
+        request, post.comments.all(), CommentSerializer,
+        key=('created', 'id')
+    )
+
+
+@api_view(1)
+def groups(request):
+    serializer = GroupSerializer(request.GET.get('fields'))
+    rows, links = id_page(request, serializer.prepare(Group.objects.all()))
+    return {'results': [serializer(row) for row in rows], **links}
+
+
+@api_view(1)
+def group_detail(request, slug):
+    return detail(request, Group.objects.all(), GroupSerializer, slug=slug)
+
+
+@api_view(2)
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return listing(request, group.posts.all(), PostSerializer)
+
+
+@api_view(1)
+def profile(request, username):
+    return detail(
+        request, User.objects.all(), ProfileSerializer, username=username
+    )
+
+
+@api_view(2)
+def profile_posts(request, username):
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return listing(request, author.posts.all(), PostSerializer)
+
+
+@api_view(6, login_required=True)
+def follow_index(request):
+    return listing(
+        request, get_timeline(request.user), PostSerializer, TIMELINE_KEY
+    )
+
+
+@api_view(3, login_required=True)
+def follows(request):
+    serializer = FollowSerializer(request.GET.get('fields'))
+    rows, links = id_page(
+        request, serializer.prepare(request.user.follower.all())
+    )
+    return {'results': [serializer(row) for row in rows], **links}
@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .db import apply_pragmas
+        connection_created.connect(apply_pragmas, dispatch_uid='core.db')
+        if getattr(settings, 'TEMPLATE_WARMUP', False):
+            from .warmup import warm_templates
+            warm_templates()
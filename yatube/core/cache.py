@@ -0,0 +1,388 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Сколько ключей отдавать SQLite в одном IN (...).
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    """
+    Общий для всех процессов кэш в отдельном файле SQLite (LOCATION).
+
+    Нужен там, где нет memcached/redis: процессы gunicorn видят одни
+    и те же значения, а get_many/set_many обходятся одним запросом.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Подключение на поток; после fork открывается заново.
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute('PRAGMA journal_mode = wal')
+            db.execute('PRAGMA synchronous = normal')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB, expires REAL)'
+            )
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _load_many(self, keys):
+        """{полный ключ: pickle} для живых записей."""
+        found = {}
+        now = time.time()
+        db = self._connection()
+        for chunk in _chunks(keys):
+            rows = db.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN '
+                f'({", ".join("?" * len(chunk))})', chunk
+            )
+            for key, value, expires in rows:
+                if expires is None or expires > now:
+                    found[key] = value
+        return found
+
+    def _store_many(self, rows):
+        db = self._connection()
+        with self._lock:
+            self._writes += len(rows)
+            cull = self._writes >= self._max_entries // 10
+            if cull:
+                self._writes = 0
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)', rows
+            )
+            if cull:
+                self._cull(db)
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _cull(self, db):
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,)
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        value = self._load_many([key]).get(key)
+        return default if value is None else pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        full = {self._key(key, version): key for key in keys}
+        return {
+            full[key]: pickle.loads(value)
+            for key, value in self._load_many(full).items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        self._store_many([
+            (
+                self._key(key, version),
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                expires,
+            )
+            for key, value in data.items()
+        ])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection().execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires WHERE cache.expires <= ?',
+            (
+                self._key(key, version),
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                self.get_backend_timeout(timeout), time.time(),
+            )
+        )
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (
+                self.get_backend_timeout(timeout),
+                self._key(key, version), time.time(),
+            )
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._connection()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            value = self._load_many([key]).get(key)
+            if value is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(value) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key)
+            )
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return key in self._load_many([key])
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        db = self._connection()
+        for chunk in _chunks(keys):
+            db.execute(
+                'DELETE FROM cache WHERE key IN '
+                f'({", ".join("?" * len(chunk))})', chunk
+            )
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+
+class TieredCache(BaseCache):
+    """
+    Небольшой LRU в памяти процесса перед общим кэшем (OPTIONS['SHARED']).
+
+    Запись идет в оба уровня. Локальная копия живет не дольше
+    LOCAL_TIMEOUT секунд. Каждая запись (set, add, incr, delete)
+    кладет затронутые ключи в общий журнал инвалидаций под растущим
+    номером; раз в CHECK_INTERVAL
+    секунд процесс дочитывает журнал и выбрасывает из LRU только эти
+    ключи. Весь LRU сбрасывается лишь после clear() или если процесс
+    отстал от журнала больше, чем тот хранит. Статистика попаданий
+    по уровням — stats().
+    """
+    GENERATION_KEY = 'tiered:generation'
+    SEQUENCE_KEY = 'tiered:sequence'
+    # Журнал хранит последние записи, отставшие процессы чистят все.
+    LOG_TIMEOUT = 60
+    LOG_LIMIT = 1000
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._check_interval = options.get('CHECK_INTERVAL', 1)
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._generation = None
+        self._sequence = None
+        self._checked_at = 0
+        self._stats = Counter()
+        # Свои записи в журнале процесс пропускает: LRU уже обновлен.
+        self._origin = uuid.uuid4().hex
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def stats(self):
+        """Попадания и промахи по уровням в этом процессе."""
+        with self._lock:
+            return dict(self._stats, local_entries=len(self._entries))
+
+    @staticmethod
+    def _log_key(number):
+        return f'tiered:log:{number}'
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._checked_at < self._check_interval:
+            return
+        self._checked_at = now
+        state = self.shared.get_many([self.GENERATION_KEY, self.SEQUENCE_KEY])
+        generation = state.get(self.GENERATION_KEY)
+        sequence = state.get(self.SEQUENCE_KEY, 0)
+        with self._lock:
+            known = self._sequence
+        stale = None
+        if (
+            generation == self._generation and known is not None
+            and 0 <= sequence - known <= self.LOG_LIMIT
+        ):
+            numbers = range(known + 1, sequence + 1)
+            log = self.shared.get_many(
+                [self._log_key(number) for number in numbers]
+            )
+            if len(log) == len(numbers):
+                stale = [
+                    key for origin, keys in log.values()
+                    if origin != self._origin for key in keys
+                ]
+        with self._lock:
+            if stale is None:
+                if self._entries:
+                    self._stats['local_flushes'] += 1
+                self._entries.clear()
+            else:
+                self._forget(stale)
+            self._generation = generation
+            self._sequence = sequence
+
+    def _invalidate(self, keys):
+        """Сообщает остальным процессам, что их копии ключей устарели."""
+        self._forget(keys)
+        try:
+            number = self.shared.incr(self.SEQUENCE_KEY)
+        except ValueError:
+            self.shared.add(self.SEQUENCE_KEY, 0, None)
+            number = self.shared.incr(self.SEQUENCE_KEY)
+        self.shared.set(
+            self._log_key(number), (self._origin, keys), self.LOG_TIMEOUT
+        )
+
+    def _remember(self, key, value, timeout):
+        # get_backend_timeout возвращает момент истечения, а не срок.
+        expires = time.time() + self._local_timeout
+        deadline = self.get_backend_timeout(timeout)
+        if deadline is not None:
+            expires = min(expires, deadline)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries[key] = (data, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def _recall(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, expires = entry
+            if expires <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return pickle.loads(data)
+
+    def _forget(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found, missing = {}, []
+        for key in keys:
+            value = self._recall(self.make_key(key, version))
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        self._stats['local_hits'] += len(found)
+        self._stats['local_misses'] += len(missing)
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            self._stats['shared_hits'] += len(shared)
+            self._stats['shared_misses'] += len(missing) - len(shared)
+            for key, value in shared.items():
+                self._remember(self.make_key(key, version), value, None)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        written = [key for key in data if key not in failed]
+        if written:
+            self._invalidate([self.make_key(key, version) for key in written])
+        for key in written:
+            self._remember(self.make_key(key, version), data[key], timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._invalidate([self.make_key(key, version)])
+            self._remember(self.make_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self._invalidate([self.make_key(key, version)])
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version=version)
+        self._invalidate([self.make_key(key, version) for key in keys])
+
+    def clear(self):
+        # Поколение переживает очистку и только растет; журнал
+        # после нее начинается заново.
+        generation = self.shared.get(self.GENERATION_KEY) or 0
+        self.shared.clear()
+        self.shared.set(
+            self.GENERATION_KEY,
+            max(generation + 1, int(time.time() * 1000)), None
+        )
+        with self._lock:
+            self._entries.clear()
+            self._checked_at = 0
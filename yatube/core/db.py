@@ -0,0 +1,66 @@
+import logging
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_writer_lock = threading.Lock()
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """
+    Настраивает каждое новое подключение к SQLite прагмами
+    из SQLITE_PRAGMAS (обработчик сигнала connection_created).
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    if connection.alias in getattr(settings, 'DATABASE_REPLICAS', ()):
+        # Реплика — копия primary: режим журнала задает команда replicate.
+        pragmas.pop('journal_mode', None)
+    # Напрямую в sqlite3: прагмы не должны попадать в учет запросов.
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def run_write(func, *args, **kwargs):
+    """
+    Выполняет запись в отдельной транзакции.
+
+    Внутри процесса писатели идут по одному, так что потоки не ждут
+    друг друга в busy_timeout. Если базу держит другой процесс и SQLite
+    отвечает «database is locked», транзакция откатывается
+    и повторяется с растущей паузой.
+    """
+    if connection.in_atomic_block:
+        # Повторить вложенную транзакцию нельзя: решает внешний код.
+        return func(*args, **kwargs)
+    attempts = getattr(settings, 'SQLITE_WRITE_ATTEMPTS', 5)
+    delay = getattr(settings, 'SQLITE_WRITE_BACKOFF', 0.05)
+    for attempt in range(1, attempts + 1):
+        try:
+            with _writer_lock, transaction.atomic():
+                return func(*args, **kwargs)
+        except OperationalError as error:
+            if attempt == attempts or not is_locked(error):
+                raise
+            logger.warning(
+                'База занята, попытка записи %s из %s', attempt, attempts
+            )
+            time.sleep(delay * 2 ** (attempt - 1))
+
+
+def serialized_write(func):
+    """Декоратор: вызовы функции выполняются через run_write."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return run_write(func, *args, **kwargs)
+    return wrapper
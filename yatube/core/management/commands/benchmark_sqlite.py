@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from core.db import run_write
+from posts.models import Comment, Post
+
+MODES = ('before', 'after')
+
+
+def _read(post):
+    list(Post.objects.select_related('author', 'group')[:10])
+    list(post.comments.select_related('author').order_by('-created')[:20])
+
+
+def _write(post, author):
+    Comment.objects.create(post=post, author=author, text='Нагрузка')
+
+
+def _worker(mode, role, path, post_pk, duration, results):
+    """Процесс-воркер: читает или пишет, пока не выйдет время."""
+    connections['default'].settings_dict['NAME'] = path
+    if mode == 'before':
+        settings.SQLITE_PRAGMAS = {}
+    post = Post.objects.select_related('author').get(pk=post_pk)
+    done = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            if role == 'read':
+                _read(post)
+            elif mode == 'before':
+                with transaction.atomic():
+                    _write(post, post.author)
+            else:
+                run_write(_write, post, post.author)
+        except OperationalError:
+            errors += 1
+        else:
+            done += 1
+    connections.close_all()
+    results.put((role, done, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает копию базы параллельными читателями и писателями '
+        'без настроек SQLite (before) и с прагмами и повтором записи '
+        'из core.db (after); печатает операции в секунду.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Секунд нагрузки на каждый режим.'
+        )
+
+    def copy_database(self, directory, mode):
+        path = os.path.join(directory, f'{mode}.sqlite3')
+        source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+        target = sqlite3.connect(path)
+        source.backup(target)
+        # Режим журнала хранится в файле: для before возвращаем обычный.
+        target.execute(
+            'PRAGMA journal_mode = {}'.format(
+                'delete' if mode == 'before' else 'wal'
+            )
+        )
+        target.close()
+        source.close()
+        return path
+
+    def run_mode(self, mode, path, post_pk, options):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        roles = (
+            ['read'] * options['readers'] + ['write'] * options['writers']
+        )
+        # Подключение родителя не должно достаться дочерним процессам.
+        connections.close_all()
+        workers = [
+            context.Process(target=_worker, args=(
+                mode, role, path, post_pk, options['duration'], results
+            ))
+            for role in roles
+        ]
+        for worker in workers:
+            worker.start()
+        totals = {'read': [0, 0], 'write': [0, 0]}
+        for _ in workers:
+            role, done, errors = results.get()
+            totals[role][0] += done
+            totals[role][1] += errors
+        for worker in workers:
+            worker.join()
+        return totals
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Бенчмарк рассчитан на SQLite.')
+        post = Post.objects.order_by('-pk').first()
+        if post is None:
+            raise CommandError('В базе нет постов: запустите seed_data.')
+        directory = tempfile.mkdtemp()
+        try:
+            self.stdout.write(
+                f'{"mode":<8} {"reads/s":>10} {"writes/s":>10} '
+                f'{"read errors":>12} {"write errors":>13}'
+            )
+            for mode in MODES:
+                path = self.copy_database(directory, mode)
+                totals = self.run_mode(mode, path, post.pk, options)
+                duration = options['duration']
+                self.stdout.write(
+                    f'{mode:<8} {totals["read"][0] / duration:>10.1f} '
+                    f'{totals["write"][0] / duration:>10.1f} '
+                    f'{totals["read"][1]:>12} {totals["write"][1]:>13}'
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
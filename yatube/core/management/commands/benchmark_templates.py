@@ -0,0 +1,120 @@
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+
+from core.warmup import template_names
+from posts.constants import limitation
+from posts.forms import CommentForm
+from posts.models import Post
+
+DEFAULT_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def make_backend(cached):
+    """Движок шаблонов проекта с кэширующим загрузчиком или без него."""
+    config = settings.TEMPLATES[0]
+    loaders = DEFAULT_LOADERS
+    if cached:
+        loaders = [('django.template.loaders.cached.Loader', DEFAULT_LOADERS)]
+    return DjangoTemplates({
+        'NAME': 'benchmark',
+        'DIRS': config['DIRS'],
+        'APP_DIRS': False,
+        'OPTIONS': dict(
+            config.get('OPTIONS', {}), loaders=loaders, debug=False
+        ),
+    })
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоимость рендеринга каждого шаблона проекта '
+        'без кэширующего загрузчика и с ним (после прогрева).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Сколько раз рендерить каждый шаблон.'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Включить шаблоны сторонних приложений (admin и т. п.).'
+        )
+
+    def sample_context(self):
+        posts = Post.objects.select_related('author', 'group')
+        page_obj = Paginator(posts, limitation).get_page(1)
+        post = posts.filter(group__isnull=False).first() or posts.first()
+        return {
+            'page_obj': page_obj,
+            'post': post,
+            'group': post and post.group,
+            'author': post and post.author,
+            'comments': post.comments.select_related('author')[:20]
+            if post else [],
+            'form': CommentForm(),
+        }
+
+    def measure(self, backend, name, context, request, repeat):
+        start = perf_counter()
+        for _ in range(repeat):
+            backend.get_template(name).render(context, request)
+        return (perf_counter() - start) * 1000 / repeat
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        context = self.sample_context()
+        # Страницы рендерятся заранее, чтобы не считать запросы к базе.
+        context['page_obj'].object_list = list(
+            context['page_obj'].object_list
+        )
+        context['comments'] = list(context['comments'])
+        plain, cached = make_backend(False), make_backend(True)
+        names = template_names(plain.engine)
+        if not options['all']:
+            names = [
+                name for name in names
+                if plain.engine.find_template(name)[1].name.startswith(
+                    str(settings.BASE_DIR)
+                )
+            ]
+        self.stdout.write(
+            f'{"template":<40} {"plain, ms":>10} {"cached, ms":>11} '
+            f'{"speedup":>8}'
+        )
+        total_plain = total_cached = 0
+        for name in names:
+            try:
+                # Прогрев: первая загрузка и ленивые запросы в контексте.
+                plain.get_template(name).render(context, request)
+                cached.get_template(name).render(context, request)
+            except Exception as error:
+                self.stdout.write(f'{name:<40} пропущен: {error}')
+                continue
+            plain_ms = self.measure(
+                plain, name, context, request, options['repeat']
+            )
+            cached_ms = self.measure(
+                cached, name, context, request, options['repeat']
+            )
+            total_plain += plain_ms
+            total_cached += cached_ms
+            self.stdout.write(
+                f'{name:<40} {plain_ms:>10.3f} {cached_ms:>11.3f} '
+                f'{plain_ms / cached_ms:>7.1f}x'
+            )
+        if total_cached:
+            self.stdout.write(
+                f'{"total":<40} {total_plain:>10.3f} {total_cached:>11.3f} '
+                f'{total_plain / total_cached:>7.1f}x'
+            )
@@ -0,0 +1,169 @@
+import json
+import os
+from statistics import quantiles
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, get_resolver, reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+NAMESPACES = ('posts', 'users', 'about')
+# Эти адреса меняют состояние даже по GET.
+SKIP = {'posts:profile_follow', 'posts:profile_unfollow', 'users:logout'}
+# Запас на шум замеров, после которого медиана считается регрессией:
+# относительный и абсолютный, чтобы не ловить доли миллисекунды.
+THRESHOLD = 0.2
+MIN_DELTA_MS = 1.0
+
+
+def named_urls():
+    """Имена всех адресов из NAMESPACES вместе с их параметрами."""
+    resolver = get_resolver()
+    for namespace in NAMESPACES:
+        _, sub_resolver = resolver.namespace_dict[namespace]
+        for pattern in sub_resolver.url_patterns:
+            if isinstance(pattern, URLPattern) and pattern.name:
+                yield (
+                    f'{namespace}:{pattern.name}',
+                    list(pattern.pattern.converters)
+                    or list(pattern.pattern.regex.groupindex),
+                )
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет все именованные адреса posts, users и about: '
+        'перцентили времени ответа, число запросов и размер ответа. '
+        'Сравнивает результат с сохраненной базовой линией.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=30,
+            help='Сколько раз запрашивать каждый адрес.'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--baseline', default='benchmark_baseline.json',
+            help='Файл базовой линии.'
+        )
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Записать результат как новую базовую линию.'
+        )
+
+    def sample_kwargs(self):
+        """Параметры адресов: самые нагруженные группа, автор и пост."""
+        author = User.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        group = Group.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        post = Post.objects.order_by('-comments_count').first()
+        if not (author and group and post):
+            raise CommandError('База пуста: сначала запустите seed_data.')
+        reader = User.objects.annotate(
+            total=Count('follower')
+        ).order_by('-total').first()
+        return reader, {
+            'username': author.username,
+            'slug': group.slug,
+            'post_id': post.pk,
+            'kind': 'atom',
+        }
+
+    def measure(self, client, url, repeat, cold):
+        timings = []
+        # Первый запрос прогревает шаблоны и соединение с базой.
+        client.get(url)
+        for _ in range(repeat):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                start = perf_counter()
+                response = client.get(url)
+                content = (
+                    b''.join(response.streaming_content)
+                    if response.streaming else response.content
+                )
+                timings.append((perf_counter() - start) * 1000)
+        cuts = quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+        return {
+            'status': response.status_code,
+            'p50': round(cuts[49], 3),
+            'p90': round(cuts[89], 3),
+            'p99': round(cuts[98], 3),
+            'queries': len(queries),
+            'bytes': len(content),
+        }
+
+    def compare(self, name, result, baseline):
+        previous = baseline.get(name)
+        if previous is None:
+            return []
+        problems = []
+        if result['p50'] > max(
+            previous['p50'] * (1 + THRESHOLD), previous['p50'] + MIN_DELTA_MS
+        ):
+            problems.append(
+                f'p50 {previous["p50"]:.2f} -> {result["p50"]:.2f} мс'
+            )
+        if result['queries'] > previous['queries']:
+            problems.append(
+                f'запросов {previous["queries"]} -> {result["queries"]}'
+            )
+        return problems
+
+    def handle(self, *args, **options):
+        reader, kwargs = self.sample_kwargs()
+        client = Client()
+        client.force_login(reader)
+        baseline = {}
+        if os.path.exists(options['baseline']) and not options['save']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        results = {}
+        regressions = 0
+        self.stdout.write(
+            f'{"url":<32} {"code":>4} {"p50":>8} {"p90":>8} {"p99":>8} '
+            f'{"sql":>4} {"bytes":>8}'
+        )
+        for name, params in named_urls():
+            if name in SKIP or set(params) - set(kwargs):
+                continue
+            url = reverse(name, kwargs={key: kwargs[key] for key in params})
+            result = self.measure(
+                client, url, options['repeat'], options['cold']
+            )
+            results[name] = result
+            problems = self.compare(name, result, baseline)
+            regressions += bool(problems)
+            line = (
+                f'{name:<32} {result["status"]:>4} {result["p50"]:>8.2f} '
+                f'{result["p90"]:>8.2f} {result["p99"]:>8.2f} '
+                f'{result["queries"]:>4} {result["bytes"]:>8}'
+            )
+            if problems:
+                line = self.style.ERROR(f'{line}  ' + '; '.join(problems))
+            self.stdout.write(line)
+        if options['save']:
+            with open(options['baseline'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            self.stdout.write(
+                f'Базовая линия записана в {options["baseline"]}'
+            )
+        elif regressions:
+            raise CommandError(f'Регрессий: {regressions}')
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводит сохраненные профили запросов (ProfilingMiddleware) '
+        'и печатает самые дорогие функции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--view', help='Имя view, например posts:index; иначе все.'
+        )
+        parser.add_argument(
+            '--sort', choices=('cumulative', 'tottime'),
+            default='cumulative', help='По какому времени сортировать.'
+        )
+        parser.add_argument('--limit', type=int, default=30)
+
+    def handle(self, *args, **options):
+        for view_name, count in profiling.views().items():
+            self.stdout.write(f'{view_name}: профилей {count}')
+        stats = profiling.aggregate(options['view'])
+        if stats is None:
+            raise CommandError('Профилей нет.')
+        self.stdout.write(
+            f'\n{"calls":>8} {"tottime":>9} {"cumtime":>9}  function'
+        )
+        for function, calls, total_time, cumulative_time in (
+            profiling.hot_functions(stats, options['sort'], options['limit'])
+        ):
+            self.stdout.write(
+                f'{calls:>8} {total_time:>9.4f} {cumulative_time:>9.4f}  '
+                f'{function}'
+            )
@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def copy_database(source, target):
+    """
+    Снимок базы source в файл target через backup API SQLite.
+
+    Копия пишется во временный файл и подменяет target атомарно:
+    открытые подключения дочитывают старый снимок, новые видят новый.
+    """
+    temporary = f'{target}.tmp'
+    source_db = sqlite3.connect(source)
+    target_db = sqlite3.connect(temporary)
+    try:
+        source_db.backup(target_db)
+        target_db.execute('PRAGMA journal_mode = delete')
+    finally:
+        target_db.close()
+        source_db.close()
+    os.replace(temporary, target)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики из DATABASE_REPLICAS: '
+        'заменитель репликации для локальной проверки роутера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять копирование каждые N секунд (имитация лага).'
+        )
+
+    def handle(self, *args, **options):
+        aliases = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not aliases:
+            raise CommandError(
+                'Реплики не настроены: задайте YATUBE_REPLICAS.'
+            )
+        source = settings.DATABASES['default']['NAME']
+        while True:
+            started = time.monotonic()
+            for alias in aliases:
+                copy_database(source, settings.DATABASES[alias]['NAME'])
+            self.stdout.write(
+                f'Скопировано в {", ".join(aliases)} за '
+                f'{(time.monotonic() - started) * 1000:.0f} мс'
+            )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,91 @@
+import cProfile
+
+from django.conf import settings
+
+from . import profiling, routers
+from .queries import QueryRecorder, record_view
+
+
+class QueryBudgetMiddleware:
+    """
+    Замеряет число и время SQL-запросов каждого view.
+
+    Замер кладется в request.query_stats, бюджет берется из
+    атрибута query_budget функции view (см. core.queries.query_budget).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with recorder.record():
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is not None:
+            request.query_stats = recorder
+            record_view(
+                match.view_name, recorder,
+                getattr(match.func, 'query_budget', None)
+            )
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Решает, можно ли запросу читать с реплик (core.routers.ReplicaRouter).
+
+    На primary закрепляются запросы с изменяющими методами, админка
+    и пользователи, писавшие в базу последние REPLICA_PIN_SECONDS секунд:
+    после записи им ставится cookie routers.PIN_COOKIE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pin = (
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            or request.path.startswith('/admin/')
+            or routers.PIN_COOKIE in request.COOKIES
+        )
+        with routers.request_routing(pin):
+            response = self.get_response(request)
+            wrote = routers.has_written()
+        if wrote and routers.replicas():
+            response.set_cookie(
+                routers.PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Выполняет запрос под cProfile и сохраняет pstats по имени view.
+
+    Профилируются запросы сотрудников с параметром ?profile,
+    запросы с подписанным заголовком X-Profile
+    (см. core.profiling.make_token) и доля PROFILING_SAMPLE_RATE
+    остальных. Отчеты — команда profile_report и admin/profiles/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.is_requested(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        match = request.resolver_match
+        if match is not None:
+            response['X-Profile-Id'] = profiling.store(
+                profiler, match.view_name
+            )
+        return response
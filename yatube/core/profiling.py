@@ -0,0 +1,107 @@
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signing
+
+SALT = 'core.profiling'
+HEADER = 'HTTP_X_PROFILE'
+# Имя view становится именем папки: без слешей и без точки в начале.
+VIEW_NAME = re.compile(r'\w[\w.:-]*')
+
+
+def get_dir():
+    return getattr(
+        settings, 'PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles')
+    )
+
+
+def make_token():
+    """
+    Подписанный токен для заголовка X-Profile, например для curl.
+    Действует PROFILING_TOKEN_MAX_AGE секунд.
+    """
+    return signing.TimestampSigner(salt=SALT).sign('profile')
+
+
+def is_requested(request):
+    """Профилировать ли запрос: по просьбе сотрудника или по выборке."""
+    token = request.META.get(HEADER)
+    if token:
+        try:
+            return signing.TimestampSigner(salt=SALT).unsign(
+                token,
+                max_age=getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600)
+            ) == 'profile'
+        except signing.BadSignature:
+            return False
+    if 'profile' in request.GET and request.user.is_staff:
+        return True
+    rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+def _folder(view_name):
+    if not VIEW_NAME.fullmatch(view_name):
+        raise ValueError(f'Недопустимое имя view: {view_name!r}')
+    return os.path.join(get_dir(), view_name.replace(':', '.'))
+
+
+def store(profiler, view_name):
+    """Сохраняет pstats запроса, оставляя не больше PROFILING_KEEP файлов."""
+    folder = _folder(view_name)
+    os.makedirs(folder, exist_ok=True)
+    name = f'{time.time():.6f}-{uuid.uuid4().hex[:8]}.prof'
+    profiler.dump_stats(os.path.join(folder, name))
+    files = sorted(os.listdir(folder))
+    for old in files[:-getattr(settings, 'PROFILING_KEEP', 50)]:
+        os.remove(os.path.join(folder, old))
+    return name
+
+
+def views():
+    """Представления, для которых есть профили, и число профилей."""
+    root = get_dir()
+    if not os.path.isdir(root):
+        return {}
+    return {
+        folder.replace('.', ':'): len(os.listdir(os.path.join(root, folder)))
+        for folder in sorted(os.listdir(root))
+    }
+
+
+def aggregate(view_name=None):
+    """Объединяет сохраненные профили одного или всех представлений."""
+    recorded = views()
+    # Имя приходит из запроса: к диску идем только с известными.
+    if view_name and view_name not in recorded:
+        return None
+    names = [view_name] if view_name else list(recorded)
+    paths = [
+        os.path.join(_folder(name), file)
+        for name in names if os.path.isdir(_folder(name))
+        for file in sorted(os.listdir(_folder(name)))
+    ]
+    if not paths:
+        return None
+    return pstats.Stats(*paths)
+
+
+def hot_functions(stats, sort='cumulative', limit=30):
+    """Самые дорогие функции: (функция, вызовы, собственное, общее время)."""
+    key = 2 if sort == 'tottime' else 3
+    rows = [
+        (
+            f'{filename}:{line}({function})',
+            calls, total_time, cumulative_time,
+        )
+        for (filename, line, function), (
+            _, calls, total_time, cumulative_time, _
+        ) in stats.stats.items()
+    ]
+    rows.sort(key=lambda row: row[key], reverse=True)
+    return rows[:limit]
@@ -0,0 +1,91 @@
+import logging
+import re
+import threading
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Сколько одинаковых запросов за запрос считать признаком N+1.
+N_PLUS_ONE_THRESHOLD = 3
+
+_stats = defaultdict(Counter)
+_lock = threading.Lock()
+
+
+def query_budget(limit):
+    """Объявляет предельное число SQL-запросов на один вызов view."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def fingerprint(sql):
+    """Отпечаток запроса: списки IN любой длины считаются одинаковыми."""
+    return re.sub(r'\((?:%s, )+%s\)', '(%s)', sql)
+
+
+class QueryRecorder:
+    """Считает запросы и их время на всех подключениях к базе."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @property
+    def repeated(self):
+        """Запросы, повторившиеся подозрительно много раз."""
+        return {
+            sql: times for sql, times in self.fingerprints.items()
+            if times >= N_PLUS_ONE_THRESHOLD
+        }
+
+
+def record_view(view_name, recorder, budget=None):
+    """Добавляет замер запроса в статистику view и пишет предупреждения."""
+    over_budget = budget is not None and recorder.count > budget
+    with _lock:
+        stats = _stats[view_name]
+        stats['requests'] += 1
+        stats['queries'] += recorder.count
+        stats['duration'] += recorder.duration
+        stats['over_budget'] += over_budget
+        stats['n_plus_one'] += bool(recorder.repeated)
+    if over_budget:
+        logger.warning(
+            '%s: %d SQL-запросов при бюджете %d',
+            view_name, recorder.count, budget
+        )
+    for sql, times in recorder.repeated.items():
+        logger.warning('%s: возможный N+1, %d раз: %s', view_name, times, sql)
+
+
+def get_view_stats():
+    with _lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def reset_view_stats():
+    with _lock:
+        _stats.clear()
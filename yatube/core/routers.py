@@ -0,0 +1,97 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+PRIMARY = 'default'
+# Cookie, по которой пользователь после записи читает с primary.
+PIN_COOKIE = 'pin_primary'
+
+_state = threading.local()
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def is_pinned():
+    """
+    Чтение идет на primary: вне запроса, в закрепленном, после записи
+    и внутри read_primary.
+    """
+    return (
+        not getattr(_state, 'active', False)
+        or getattr(_state, 'pinned', False)
+        or getattr(_state, 'wrote', False)
+        or getattr(_state, 'forced', False)
+    )
+
+
+def has_written():
+    return getattr(_state, 'wrote', False)
+
+
+@contextmanager
+def request_routing(pin=False):
+    """
+    Рамка веб-запроса: только внутри нее чтение может уйти на реплику.
+    Команды и миграции всегда работают с primary.
+    """
+    _state.active, _state.pinned, _state.wrote = True, pin, False
+    _state.replica = None
+    try:
+        yield
+    finally:
+        _state.active = _state.pinned = _state.wrote = False
+        _state.replica = None
+
+
+@contextmanager
+def read_primary():
+    """
+    Чтение внутри блока идет на primary. Так заполняются общие кэши:
+    данные отставшей реплики не должны лечь под ключ свежего поколения,
+    который читают и закрепленные за primary пользователи.
+    """
+    previous = getattr(_state, 'forced', False)
+    _state.forced = True
+    try:
+        yield
+    finally:
+        _state.forced = previous
+
+
+class ReplicaRouter:
+    """
+    Чтение — на случайную реплику из DATABASE_REPLICAS, запись — на primary.
+
+    Реплики читаются только внутри веб-запроса, и то если он
+    не закреплен (см. core.middleware.ReplicaMiddleware) и в нем еще
+    не было записи: так пользователь видит собственные изменения,
+    пока реплики отстают.
+    Схема на реплики не мигрирует, они копируют primary целиком.
+    """
+
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or is_pinned():
+            return PRIMARY
+        # Одна реплика на весь запрос: одно подключение и один снимок.
+        replica = getattr(_state, 'replica', None)
+        if replica not in aliases:
+            replica = _state.replica = random.choice(aliases)
+        return replica
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *replicas()}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
@@ -0,0 +1,123 @@
+import math
+import random
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .routers import read_primary
+
+# Сколько ждать чужого пересчета, когда отдать нечего. Блокировка
+# холодного ключа живет WAIT_LIMIT * 2, так что за WAIT_ROUNDS раундов
+# зависшую блокировку успевает перехватить один из ждущих.
+WAIT_STEP = 0.05
+WAIT_LIMIT = 1.0
+WAIT_ROUNDS = 3
+
+_stats = Counter()
+_lock = threading.Lock()
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def stats():
+    """
+    Счетчики процесса: hits, recomputes, early_refreshes, а также
+    stale_served и waited — пересчеты, которые удалось не делать.
+    """
+    with _lock:
+        result = dict(_stats)
+    result['saved'] = result.get('stale_served', 0) + result.get('waited', 0)
+    return result
+
+
+def _lock_key(key):
+    return f'stampede:lock:{key}'
+
+
+def _release(key):
+    cache.delete(_lock_key(key))
+
+
+def _should_refresh(delta, expires, beta):
+    # XFetch: чем дороже пересчет и ближе истечение, тем вероятнее
+    # обновить значение заранее, пока остальные еще читают старое.
+    gap = delta * beta * math.log(1 - random.random())
+    return time.time() - gap >= expires
+
+
+def _wait_for(key):
+    deadline = time.monotonic() + WAIT_LIMIT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _lock_cold(key):
+    """
+    Берет блокировку холодного ключа, а пока ее держит другой, ждет
+    его значения. Возвращает (взята ли блокировка, дождавшееся значение).
+    """
+    for _ in range(WAIT_ROUNDS):
+        if cache.add(_lock_key(key), 1, timeout=WAIT_LIMIT * 2):
+            return True, None
+        entry = _wait_for(key)
+        if entry is not None:
+            return False, entry
+    return False, None
+
+
+def get_or_compute(key, compute, timeout, beta=1.0):
+    """
+    Значение из кэша или compute(), без толпы одновременных пересчетов.
+
+    Вместе со значением хранится время его расчета и момент истечения.
+    Незадолго до истечения один из запросов вероятностно берется
+    пересчитать значение заранее. Пересчитывает только тот, кто взял
+    блокировку ключа; остальные отдают прежнее значение, которое
+    держится в кэше еще CACHE_STALE_GRACE секунд после истечения,
+    а при холодном ключе ждут результата или перехватывают истекшую
+    блокировку. compute() читает с primary, а не с реплики.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        if not _should_refresh(delta, expires, beta):
+            _count('hits')
+            return value
+        if not cache.add(_lock_key(key), 1, timeout=delta * 2 + 1):
+            _count('stale_served')
+            return value
+        _count('early_refreshes' if time.time() < expires else 'refreshes')
+    else:
+        locked, entry = _lock_cold(key)
+        if entry is not None:
+            _count('waited')
+            return entry[0]
+        if not locked:
+            # Блокировку держит другой и не отдает: считаем только
+            # для себя, не трогая ни кэш, ни чужую блокировку.
+            _count('uncached')
+            with read_primary():
+                return compute()
+    started = time.perf_counter()
+    try:
+        with read_primary():
+            value = compute()
+        delta = time.perf_counter() - started
+        grace = getattr(settings, 'CACHE_STALE_GRACE', 60)
+        cache.set(
+            key, (value, delta, time.time() + timeout), timeout + grace
+        )
+        _count('recomputes')
+    finally:
+        _release(key)
+    return value
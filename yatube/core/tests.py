@@ -1,4 +1,33 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections
+from django.template import engines
+from django.test import (RequestFactory, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts.models import Post
+from yatube import settings_production as production
+
+from . import profiling, routers, stampede
+from .cache import TieredCache
+from .db import run_write
+from .management.commands.replicate import copy_database
+from .middleware import ReplicaMiddleware
+from .queries import N_PLUS_ONE_THRESHOLD, QueryRecorder
+from .warmup import template_names, warm_templates
 
 
 class ViewTestClass(TestCase):
@@ -7,3 +36,447 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, template)
+
+
+class QueryRecorderTest(TestCase):
+    def test_repeated_queries_detected(self):
+        """Одинаковые запросы с разными параметрами считаются N+1."""
+        user_model = get_user_model()
+        recorder = QueryRecorder()
+        with recorder.record():
+            for pk in range(N_PLUS_ONE_THRESHOLD):
+                user_model.objects.filter(pk=pk).first()
+            list(user_model.objects.filter(pk__in=[1, 2]))
+            list(user_model.objects.filter(pk__in=[1, 2, 3]))
+        self.assertEqual(recorder.count, N_PLUS_ONE_THRESHOLD + 2)
+        self.assertEqual(len(recorder.repeated), 1)
+
+
+class BenchmarkTest(TestCase):
+    def test_seed_and_benchmark(self):
+        """Сгенерированные данные проходят через замер всех адресов."""
+        call_command(
+            'seed_data', users=10, groups=2, posts=30, comments=20,
+            follows=3, stdout=StringIO()
+        )
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        try:
+            call_command(
+                'benchmark_views', repeat=2, save=True, baseline=path,
+                stdout=StringIO()
+            )
+            with open(path, encoding='utf-8') as file:
+                results = json.load(file)
+            # Время не сравниваем: на тестовых данных это шум.
+            baseline = {
+                name: dict(result, p50=float('inf'))
+                for name, result in results.items()
+            }
+            baseline['posts:index']['queries'] = 0
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(baseline, file)
+            with self.assertRaisesMessage(CommandError, 'Регрессий: 1'):
+                call_command(
+                    'benchmark_views', repeat=2, baseline=path,
+                    stdout=StringIO()
+                )
+        finally:
+            os.remove(path)
+        self.assertEqual(results['posts:index']['status'], 200)
+        self.assertEqual(results['about:tech']['status'], 200)
+        self.assertNotIn('posts:profile_follow', results)
+
+
+class ProfilingTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            PROFILING_DIR=self.directory
+        )
+        self.settings_override.enable()
+        self.staff = get_user_model().objects.create_user(
+            username='staff', is_staff=True
+        )
+        self.url = reverse('posts:index')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_staff_request_profiled(self):
+        """Запрос сотрудника с ?profile сохраняется и попадает в отчет."""
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, {'profile': 1})
+        self.assertIn('X-Profile-Id', response)
+        self.assertEqual(profiling.views(), {'posts:index': 1})
+        output = StringIO()
+        call_command('profile_report', view='posts:index', stdout=output)
+        self.assertIn('views.py', output.getvalue())
+        response = self.client.get(reverse('profile_report'))
+        self.assertContains(response, 'posts:index')
+
+    def test_signed_header(self):
+        """Подписанный заголовок включает профилирование без входа."""
+        response = self.client.get(
+            self.url, HTTP_X_PROFILE=profiling.make_token()
+        )
+        self.assertIn('X-Profile-Id', response)
+        response = self.client.get(self.url, HTTP_X_PROFILE='profile:bad')
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_signed_header_expires(self):
+        token = profiling.make_token()
+        with mock.patch(
+            'django.core.signing.time.time', return_value=time.time() + 7200
+        ):
+            response = self.client.get(self.url, HTTP_X_PROFILE=token)
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_unknown_view_name_not_read(self):
+        """Имя view из запроса не превращается в произвольный путь."""
+        self.client.force_login(self.staff)
+        self.client.get(self.url, {'profile': 1})
+        self.assertIsNone(profiling.aggregate('../..'))
+        with self.assertRaises(ValueError):
+            profiling.store(None, '../outside')
+        response = self.client.get(
+            reverse('profile_report'), {'view': '../../etc'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['rows'], [])
+
+    def test_regular_request_not_profiled(self):
+        """Обычные запросы и ?profile от не сотрудника не профилируются."""
+        self.client.get(self.url, {'profile': 1})
+        self.assertEqual(profiling.views(), {})
+        response = self.client.get(reverse('profile_report'))
+        self.assertEqual(response.status_code, 302)
+
+
+class TemplateWarmupTest(TestCase):
+    def test_warm_templates_fills_cached_loader(self):
+        """Прогрев компилирует все шаблоны проекта в кэширующий загрузчик."""
+        with override_settings(TEMPLATES=production.TEMPLATES):
+            compiled = warm_templates()
+            engine = engines['django'].engine
+            self.assertEqual(compiled, len(template_names(engine)))
+            loader = engine.template_loaders[0]
+            self.assertIn('posts/index.html', loader.get_template_cache)
+
+    def test_benchmark_templates(self):
+        """Бенчмарк шаблонов печатает строку по каждому шаблону."""
+        out = StringIO()
+        call_command('benchmark_templates', repeat=1, stdout=out)
+        self.assertIn('posts/index.html', out.getvalue())
+        self.assertIn('total', out.getvalue())
+
+
+class SQLiteTuningTest(TestCase):
+    def test_pragmas_applied(self):
+        """Подключение получает прагмы из SQLITE_PRAGMAS."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -20000)
+
+
+class RunWriteTest(TransactionTestCase):
+    @override_settings(SQLITE_WRITE_BACKOFF=0)
+    def test_run_write_retries_locked(self):
+        """Запись повторяется, пока база занята, другие ошибки всплывают."""
+        calls = []
+
+        def write():
+            calls.append(connection.in_atomic_block)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'done'
+
+        with self.assertLogs('core.db', 'WARNING'):
+            self.assertEqual(run_write(write), 'done')
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(all(calls))
+
+        def broken():
+            calls.append(True)
+            raise OperationalError('no such table: posts_post')
+
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            run_write(broken)
+        self.assertEqual(len(calls), 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = routers.ReplicaRouter()
+
+    def route(self, request, write=False):
+        """Куда view прочитал бы после (возможной) записи."""
+        used = []
+
+        def view(request):
+            if write:
+                self.router.db_for_write(get_user_model())
+            used.append(self.router.db_for_read(get_user_model()))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(view)(request)
+        return used[0], response
+
+    def test_reads_go_to_replica(self):
+        alias, response = self.route(self.factory.get('/'))
+        self.assertEqual(alias, 'replica1')
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_pinned_requests_read_primary(self):
+        """POST, админка и cookie после записи читают с primary."""
+        pinned_cookie = self.factory.get('/')
+        pinned_cookie.COOKIES[routers.PIN_COOKIE] = '1'
+        for request in (
+            self.factory.post('/'),
+            self.factory.get('/admin/posts/post/'),
+            pinned_cookie,
+        ):
+            with self.subTest(path=request.path, method=request.method):
+                self.assertEqual(self.route(request)[0], routers.PRIMARY)
+
+    def test_write_pins_user(self):
+        """После записи чтение в том же запросе и cookie ведут на primary."""
+        alias, response = self.route(self.factory.get('/'), write=True)
+        self.assertEqual(alias, routers.PRIMARY)
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]['max-age'], 5)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        alias, response = self.route(self.factory.get('/'), write=True)
+        self.assertEqual(alias, routers.PRIMARY)
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_stale_replica_not_cached(self):
+        """
+        Запрос с реплики не кладет ее отставшие данные в общий кэш:
+        автор после записи видит свой пост.
+        """
+        # Реплика — снимок базы до записи.
+        path = os.path.join(tempfile.mkdtemp(), 'replica.sqlite3')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        snapshot = sqlite3.connect(path)
+        connection.ensure_connection()
+        connection.connection.backup(snapshot)
+        snapshot.close()
+        connections.databases['replica1'] = dict(
+            connections.databases['default'], NAME=path, TEST={}
+        )
+
+        def drop_replica():
+            connections['replica1'].close()
+            del connections.databases['replica1']
+            delattr(connections._connections, 'replica1')
+        self.addCleanup(drop_replica)
+
+        cache.clear()
+        post = Post.objects.create(
+            text='Свежий пост',
+            author=get_user_model().objects.create_user(username='fresh'),
+        )
+        self.client.get(reverse('posts:index'))
+        self.client.cookies[routers.PIN_COOKIE] = '1'
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_no_migrations_on_replicas(self):
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+    def test_copy_database(self):
+        """Команда replicate подменяет файл реплики снимком primary."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        source = os.path.join(directory, 'primary.sqlite3')
+        target = os.path.join(directory, 'replica.sqlite3')
+        with sqlite3.connect(source) as db:
+            db.execute('CREATE TABLE item (name TEXT)')
+            db.execute("INSERT INTO item VALUES ('first')")
+        copy_database(source, target)
+        with sqlite3.connect(target) as db:
+            rows = db.execute('SELECT name FROM item').fetchall()
+        self.assertEqual(rows, [('first',)])
+
+
+class TieredCacheTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'shared': {
+                'BACKEND': 'core.cache.SQLiteCache',
+                'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            },
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        params = {'OPTIONS': {'MAX_ENTRIES': 2, 'CHECK_INTERVAL': 0}}
+        # Два «процесса» с собственными LRU над одним общим кэшем.
+        self.first = TieredCache('', params)
+        self.second = TieredCache('', params)
+
+    def test_tiers_and_stats(self):
+        """Повторное чтение обслуживает LRU, общий кэш — только промах."""
+        self.first.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.second.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2})
+        self.assertEqual(self.second.get('a'), 1)
+        stats = self.second.stats()
+        self.assertEqual(stats['local_hits'], 1)
+        self.assertEqual(stats['shared_hits'], 2)
+        self.assertEqual(stats['shared_misses'], 1)
+
+    def test_lru_is_bounded(self):
+        for key in 'abc':
+            self.first.set(key, key)
+        self.assertEqual(self.first.stats()['local_entries'], 2)
+        self.assertEqual(self.first.get('a'), 'a')
+
+    def test_invalidation_across_processes(self):
+        """delete, incr и clear в одном процессе видны в другом."""
+        self.first.set('key', 1)
+        self.assertEqual(self.second.get('key'), 1)
+        self.first.incr('key')
+        self.assertEqual(self.second.get('key'), 2)
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+        self.second.set('other', 1)
+        self.first.clear()
+        self.assertIsNone(self.second.get('other'))
+
+    def test_delete_keeps_other_local_entries(self):
+        """Удаление ключа не сбрасывает весь LRU других процессов."""
+        self.first.set_many({'a': 1, 'b': 2})
+        self.second.get_many(['a', 'b'])
+        self.first.delete('a')
+        self.assertIsNone(self.second.get('a'))
+        self.assertEqual(self.second.get('b'), 2)
+        stats = self.second.stats()
+        self.assertEqual(stats['local_hits'], 1)
+        self.assertNotIn('local_flushes', stats)
+
+    def test_set_reaches_other_processes(self):
+        """Перезапись ключа видна другому процессу после сверки журнала."""
+        self.first.set('key', 'v1')
+        self.assertEqual(self.second.get('key'), 'v1')
+        self.first.set('key', 'v2')
+        self.assertEqual(self.second.get('key'), 'v2')
+        self.assertEqual(self.first.get('key'), 'v2')
+        self.first.set('key', 'v3')
+        self.assertEqual(self.first.get('key'), 'v3')
+        self.assertEqual(self.first.stats()['local_hits'], 1)
+
+    def test_single_recompute_across_processes(self):
+        """Истекшее значение пересчитывает один процесс, а не каждый."""
+        self.first.set('key', ('old', 0, time.time() - 1), 60)
+        self.assertEqual(self.second.get('key')[0], 'old')
+        calls = []
+
+        def compute(name):
+            calls.append(name)
+            return f'{name}{len(calls)}'
+
+        for process in (self.first, self.second):
+            with mock.patch.object(stampede, 'cache', process):
+                name = 'A' if process is self.first else 'B'
+                value = stampede.get_or_compute(
+                    'key', lambda: compute(name), 60
+                )
+                self.assertEqual(value, 'A1')
+        self.assertEqual(calls, ['A'])
+
+    def test_add_and_expiry(self):
+        self.assertTrue(self.first.add('key', 1))
+        self.assertFalse(self.second.add('key', 2))
+        self.first.set('short', 1, timeout=-1)
+        self.assertIsNone(self.second.get('short'))
+        self.assertTrue(self.second.add('short', 3))
+        self.assertEqual(self.first.get('short'), 3)
+
+
+class StampedeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_fresh_value_not_recomputed(self):
+        for _ in range(3):
+            self.assertEqual(
+                stampede.get_or_compute('key', self.compute, 60), 1
+            )
+        self.assertEqual(self.calls, 1)
+
+    def test_early_refresh(self):
+        """Дорогое значение у границы срока пересчитывается заранее."""
+        cache.set('key', ('old', 10, time.time() + 1), 60)
+        with mock.patch.object(stampede.random, 'random', return_value=0.5):
+            value = stampede.get_or_compute('key', self.compute, 60)
+        self.assertEqual(value, 1)
+        self.assertEqual(stampede.stats()['early_refreshes'], 1)
+
+    def test_stale_served_while_locked(self):
+        """Пока другой воркер пересчитывает, отдается прежнее значение."""
+        saved = stampede.stats()['saved']
+        cache.set('key', ('old', 0, time.time() - 1), 60)
+        cache.add(stampede._lock_key('key'), 1, 60)
+        self.assertEqual(stampede.get_or_compute('key', self.compute, 60),
+                         'old')
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(stampede.stats()['saved'], saved + 1)
+
+    def test_cold_key_waits_for_other_worker(self):
+        cache.add(stampede._lock_key('key'), 1, 60)
+
+        def other_worker(delay):
+            cache.set('key', ('ready', 0, time.time() + 60), 60)
+
+        with mock.patch.object(stampede.time, 'sleep', other_worker):
+            value = stampede.get_or_compute('key', self.compute, 60)
+        self.assertEqual(value, 'ready')
+        self.assertEqual(self.calls, 0)
+
+    @mock.patch.object(stampede, 'WAIT_STEP', 0.01)
+    @mock.patch.object(stampede, 'WAIT_LIMIT', 0.03)
+    def test_timed_out_waiter_keeps_foreign_lock(self):
+        """Не дождавшись, воркер считает сам и не снимает чужую блокировку."""
+        lock = stampede._lock_key('key')
+        cache.add(lock, 1, 60)
+        self.assertEqual(stampede.get_or_compute('key', self.compute, 60), 1)
+        self.assertEqual(cache.get(lock), 1)
+        self.assertIsNone(cache.get('key'))
+        self.assertGreaterEqual(stampede.stats()['uncached'], 1)
+
+    @mock.patch.object(stampede, 'WAIT_STEP', 0.01)
+    @mock.patch.object(stampede, 'WAIT_LIMIT', 0.03)
+    def test_expired_lock_taken_over(self):
+        """Истекшую чужую блокировку перехватывает один из ждущих."""
+        cache.add(stampede._lock_key('key'), 1, 0.02)
+        self.assertEqual(stampede.get_or_compute('key', self.compute, 60), 1)
+        self.assertEqual(stampede.get_or_compute('key', self.compute, 60), 1)
+        self.assertEqual(self.calls, 1)
+        self.assertIsNone(cache.get(stampede._lock_key('key')))
+
+    def test_lock_released_after_error(self):
+        def broken():
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            stampede.get_or_compute('key', broken, 60)
+        self.assertEqual(stampede.get_or_compute('key', self.compute, 60), 1)
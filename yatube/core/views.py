@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
 from django.shortcuts import render
 
+from . import profiling, stampede
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +19,21 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def profile_report(request):
+    view_name = request.GET.get('view') or None
+    sort = request.GET.get('sort', 'cumulative')
+    stats = profiling.aggregate(view_name)
+    context = {
+        'title': 'Профили запросов',
+        'views': profiling.views(),
+        'view_name': view_name,
+        'sort': sort,
+        'rows': profiling.hot_functions(stats, sort) if stats else [],
+        # Попадания по уровням кэша этого процесса (core.cache.TieredCache).
+        'cache_stats': getattr(cache, 'stats', dict)(),
+        'recompute_stats': stampede.stats(),
+    }
+    return render(request, 'core/profiles.html', context)
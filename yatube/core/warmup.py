@@ -0,0 +1,41 @@
+import logging
+import os
+
+from django.template import TemplateSyntaxError, engines
+from django.template.utils import get_app_template_dirs
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(engine):
+    """Имена всех .html-шаблонов из DIRS и каталогов templates приложений."""
+    names = set()
+    directories = list(engine.dirs)
+    if engine.app_dirs or any(
+        'app_directories' in str(loader) for loader in engine.loaders
+    ):
+        directories += list(get_app_template_dirs('templates'))
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for file in files:
+                if file.endswith('.html'):
+                    path = os.path.join(root, file)
+                    names.add(os.path.relpath(path, directory))
+    return sorted(name.replace(os.sep, '/') for name in names)
+
+
+def warm_templates(using='django'):
+    """
+    Компилирует все шаблоны заранее: с кэширующим загрузчиком
+    первые запросы не тратят время на чтение и разбор файлов.
+    """
+    engine = engines[using].engine
+    compiled = 0
+    for name in template_names(engine):
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError:
+            logger.exception('Шаблон %s не компилируется', name)
+        else:
+            compiled += 1
+    return compiled
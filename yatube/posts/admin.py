@@ -1,6 +1,11 @@
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import StreamingHttpResponse
+from django.urls import path
 
+from .export import FORMATS, TYPES, export_stream
 from .models import Group, Post
+from .search import filter_posts
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -16,6 +21,44 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return filter_posts(queryset, search_term), False
+
+    def get_urls(self):
+        return [
+            path(
+                'export/',
+                self.admin_site.admin_view(self.export_view),
+                name='posts_post_export',
+            ),
+        ] + super().get_urls()
+
+    def export_view(self, request):
+        """Скачивание выгрузки потоком, без сборки файла в памяти."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        export_format = request.GET.get('format')
+        if export_format not in FORMATS:
+            export_format = 'jsonl'
+        compress = bool(request.GET.get('gzip'))
+        types = [
+            kind for kind in request.GET.get('types', '').split(',')
+            if kind in TYPES
+        ] or TYPES
+        filename = f'yatube.{export_format}' + ('.gz' if compress else '')
+        response = StreamingHttpResponse(
+            export_stream(export_format, types, compress),
+            content_type=(
+                'application/gzip' if compress else FORMATS[export_format]
+            ),
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"'
+        )
+        return response
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'description',)
@@ -0,0 +1,66 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.models import Max
+
+from . import search
+from .models import Comment, Post
+
+
+def max_pk(model):
+    return model.objects.aggregate(pk=Max('pk'))['pk'] or 0
+
+
+@contextmanager
+def keep_dates(*fields):
+    """Отключает auto_now/auto_now_add, чтобы сохранить переданные даты."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field, _, _ in saved:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def _search_triggers():
+    if not search.has_index():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+            "AND name LIKE 'posts_%_fts_%'"
+        )
+        return cursor.fetchall()
+
+
+@contextmanager
+def deferred_indexes(*models):
+    """
+    Снимает индексы моделей и поисковые триггеры на время массовой
+    вставки. После нее, в том числе при ошибке, индексы строятся
+    заново одним проходом, а новые строки добавляются в поиск.
+    """
+    post_pk, comment_pk = max_pk(Post), max_pk(Comment)
+    triggers = _search_triggers()
+    with connection.cursor() as cursor:
+        for name, _ in triggers:
+            cursor.execute(f'DROP TRIGGER {name}')
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+        if triggers:
+            search.index_since(post_pk, comment_pk)
+            with connection.cursor() as cursor:
+                for _, sql in triggers:
+                    cursor.execute(sql)
@@ -0,0 +1,62 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .listings import get_generation, get_modified
+
+
+def make_etag(request, *parts):
+    """
+    ETag страницы. Кроме переданных частей в него входят адрес
+    с параметрами, пользователь и CSRF-кука: от них зависит шапка
+    и формы на странице.
+    """
+    parts = (
+        request.get_full_path(),
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+    ) + parts
+    return md5(repr(parts).encode()).hexdigest()
+
+
+def public_last_modified(request, last_modified):
+    """
+    Last-Modified отдается только гостям: в отличие от ETag он не знает,
+    кто спрашивает, и после входа или выхода по If-Modified-Since
+    клиент получил бы 304 со страницей другого пользователя.
+    """
+    if request.user.is_authenticated:
+        return None
+    return last_modified
+
+
+def listing_validators(request, listing, *parts):
+    """ETag и Last-Modified ленты без единого запроса к базе."""
+    modified = get_modified(listing)
+    return (
+        make_etag(request, listing, get_generation(listing), *parts),
+        public_last_modified(
+            request, int(modified) if modified is not None else None
+        ),
+    )
+
+
+def not_modified(request, etag, last_modified=None):
+    """Ответ 304, если у клиента актуальная версия страницы, иначе None."""
+    response = get_conditional_response(
+        request, etag=quote_etag(etag), last_modified=last_modified
+    )
+    if response is not None:
+        add_validators(response, etag, last_modified)
+    return response
+
+
+def add_validators(response, etag, last_modified=None):
+    response['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Страница зависит от сессии и CSRF-куки.
+    patch_vary_headers(response, ('Cookie',))
+    return response
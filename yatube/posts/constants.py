@@ -1 +1,14 @@
 limitation = 10
+# Авторы с таким числом подписчиков не раскладываются по лентам,
+# их посты подтягиваются в ленту при чтении.
+fanout_limit = 1000
+# Обратно к раскладке автор возвращается, только опустившись ниже
+# этого числа, чтобы подписки на границе не переключали его туда-сюда.
+fanout_resume_limit = 800
+timeline_batch_size = 500
+# Загруженные картинки уменьшаются до этого размера по большей стороне.
+image_max_side = 1920
+image_quality = 82
+feed_size = 20
+api_max_limit = 100
+comments_limit = 20
@@ -0,0 +1,132 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def _update_user(user_id, **deltas):
+    return UserStats.objects.filter(user_id=user_id).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def _change_user(user_id, **deltas):
+    if not _update_user(user_id, **deltas):
+        recount_users([user_id])
+
+
+def _total(queryset, field):
+    return Coalesce(Subquery(
+        queryset.order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def stats_for(user):
+    """
+    Счетчики пользователя; недостающая строка создается пересчетом:
+    одним запросом счетчиков и одной вставкой.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        pass
+    counts = User.objects.filter(pk=user.pk).annotate(
+        posts_count=_total(
+            Post.objects.filter(author_id=user.pk), 'author_id'),
+        followers_count=_total(
+            Follow.objects.filter(author_id=user.pk), 'author_id'),
+        following_count=_total(
+            Follow.objects.filter(user_id=user.pk), 'user_id'),
+    ).values('posts_count', 'followers_count', 'following_count').get()
+    user.stats = UserStats(user_id=user.pk, **counts)
+    UserStats.objects.bulk_create([user.stats], ignore_conflicts=True)
+    return user.stats
+
+
+# Удаления только уменьшают существующие счетчики: при каскадном
+# удалении пользователя пересчет воскресил бы строку его счетчиков.
+
+def post_added(post):
+    _change_user(post.author_id, posts_count=1)
+
+
+def post_removed(post):
+    _update_user(post.author_id, posts_count=-1)
+
+
+def post_moved(post, previous_author_id):
+    """Пост передан другому автору (например, через админку)."""
+    _update_user(previous_author_id, posts_count=-1)
+    _change_user(post.author_id, posts_count=1)
+
+
+def comment_added(comment):
+    Post.objects.filter(pk=comment.post_id).update(
+        comments_count=F('comments_count') + 1
+    )
+
+
+def comment_removed(comment):
+    Post.objects.filter(pk=comment.post_id).update(
+        comments_count=F('comments_count') - 1
+    )
+
+
+def follow_added(follow):
+    _change_user(follow.author_id, followers_count=1)
+    _change_user(follow.user_id, following_count=1)
+
+
+def follow_removed(follow):
+    _update_user(follow.author_id, followers_count=-1)
+    _update_user(follow.user_id, following_count=-1)
+
+
+def _counts(queryset, field):
+    return dict(
+        queryset.values_list(field).annotate(total=Count('pk')).order_by()
+    )
+
+
+def recount_users(user_ids):
+    """Пересчитывает счетчики указанных пользователей по данным таблиц."""
+    user_ids = list(user_ids)
+    posts = _counts(Post.objects.filter(author_id__in=user_ids), 'author_id')
+    followers = _counts(
+        Follow.objects.filter(author_id__in=user_ids), 'author_id'
+    )
+    following = _counts(Follow.objects.filter(user_id__in=user_ids), 'user_id')
+    stats = [
+        UserStats(
+            user_id=user_id,
+            posts_count=posts.get(user_id, 0),
+            followers_count=followers.get(user_id, 0),
+            following_count=following.get(user_id, 0),
+        )
+        for user_id in User.objects.filter(
+            pk__in=user_ids
+        ).values_list('pk', flat=True)
+    ]
+    existing = set(UserStats.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', flat=True))
+    UserStats.objects.bulk_create(
+        [item for item in stats if item.user_id not in existing]
+    )
+    UserStats.objects.bulk_update(
+        [item for item in stats if item.user_id in existing],
+        ['posts_count', 'followers_count', 'following_count']
+    )
+
+
+def recount_posts(post_ids):
+    """Пересчитывает число комментариев у указанных постов."""
+    # Один UPDATE с подзапросом вместо bulk_update с CASE на каждый id.
+    comments = Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+        'post'
+    ).annotate(total=Count('pk')).values('total')
+    Post.objects.filter(pk__in=list(post_ids)).update(
+        comments_count=Coalesce(Subquery(comments), 0)
+    )
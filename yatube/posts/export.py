@@ -0,0 +1,108 @@
+import csv
+import json
+import zlib
+
+from .models import Comment, Follow, Group, Post
+
+TYPES = ('group', 'post', 'comment', 'follow')
+# Столбцы CSV: объединение полей всех типов в формате import_content.
+FIELDS = (
+    'type', 'id', 'slug', 'title', 'description', 'author', 'group',
+    'text', 'pub_date', 'post', 'created', 'user',
+)
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+BUFFER_SIZE = 64 * 1024
+
+
+def _rows(queryset, fields, chunk_size):
+    return queryset.order_by('pk').values_list(*fields).iterator(
+        chunk_size=chunk_size
+    )
+
+
+def export_records(types=TYPES, chunk_size=2000):
+    """
+    Записи для import_content. Таблицы читаются кусками по chunk_size
+    строк через values_list, без создания объектов моделей.
+    """
+    if 'group' in types:
+        for slug, title, description in _rows(
+            Group.objects, ('slug', 'title', 'description'), chunk_size
+        ):
+            yield {'type': 'group', 'slug': slug, 'title': title,
+                   'description': description}
+    if 'post' in types:
+        for pk, author, group, text, pub_date in _rows(
+            Post.objects,
+            ('pk', 'author__username', 'group__slug', 'text', 'pub_date'),
+            chunk_size
+        ):
+            yield {'type': 'post', 'id': pk, 'author': author,
+                   'group': group, 'text': text,
+                   'pub_date': pub_date.isoformat()}
+    if 'comment' in types:
+        for post, author, text, created in _rows(
+            Comment.objects,
+            ('post_id', 'author__username', 'text', 'created'),
+            chunk_size
+        ):
+            yield {'type': 'comment', 'post': post, 'author': author,
+                   'text': text, 'created': created.isoformat()}
+    if 'follow' in types:
+        for user, author in _rows(
+            Follow.objects, ('user__username', 'author__username'),
+            chunk_size
+        ):
+            yield {'type': 'follow', 'user': user, 'author': author}
+
+
+class _Echo:
+    """Файлоподобный объект для csv.writer, возвращающий строку."""
+
+    def write(self, value):
+        return value
+
+
+def to_jsonl(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def to_csv(records):
+    writer = csv.DictWriter(_Echo(), FIELDS)
+    yield writer.writeheader()
+    for record in records:
+        yield writer.writerow(record)
+
+
+def encode(lines, compress=False):
+    """Склеивает строки в куски по BUFFER_SIZE байт, при желании сжимая."""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= BUFFER_SIZE:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_stream(export_format='jsonl', types=TYPES, compress=False,
+                  chunk_size=2000):
+    """Поток байтов выгрузки; память не зависит от размера таблиц."""
+    records = export_records(types, chunk_size)
+    lines = to_csv(records) if export_format == 'csv' else to_jsonl(records)
+    return encode(lines, compress)
@@ -0,0 +1,156 @@
+import json
+from hashlib import md5
+
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils import feedgenerator
+from django.utils.text import Truncator
+
+from core.stampede import get_or_compute
+
+from .conditional import add_validators, not_modified
+from .constants import feed_size
+from .listings import get_generation, get_modified
+
+FEED_TIMEOUT = 60 * 60
+
+
+class JsonFeed(feedgenerator.SyndicationFeed):
+    """JSON Feed 1.1 (https://jsonfeed.org/version/1.1)."""
+
+    content_type = 'application/feed+json; charset=utf-8'
+
+    def write(self, outfile, encoding):
+        feed = {
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': self.feed['title'],
+            'home_page_url': self.feed['link'],
+            'feed_url': self.feed['feed_url'],
+            'description': self.feed['description'],
+            'language': self.feed['language'],
+            'items': [{
+                'id': item['unique_id'],
+                'url': item['link'],
+                'title': item['title'],
+                'content_text': item['description'],
+                'date_published': item['pubdate'].isoformat(),
+                'date_modified': item['updateddate'].isoformat(),
+                'authors': [{'name': item['author_name']}],
+                'tags': item['categories'],
+            } for item in self.items],
+        }
+        outfile.write(json.dumps(feed, ensure_ascii=False))
+
+
+FORMATS = {
+    'atom': feedgenerator.Atom1Feed,
+    'rss': feedgenerator.Rss201rev2Feed,
+    'json': JsonFeed,
+}
+
+
+def _entry(post):
+    return {
+        'pk': post.pk,
+        'text': post.text,
+        'author': post.author.get_full_name() or post.author.username,
+        'group': post.group and post.group.title,
+        'pub_date': post.pub_date,
+        'updated': post.updated,
+    }
+
+
+def get_entries(posts, listing):
+    """
+    Последние посты ленты в виде словарей.
+
+    Список хранится в кэше вместе с поколением ленты. Когда поколение
+    меняется, из базы берутся только посты, измененные после самого
+    свежего из сохраненных, а удаленные и ушедшие из ленты отбрасываются.
+    """
+    key = f'feed:entries:{listing}'
+    generation = get_generation(listing)
+    cached = cache.get(key)
+    if cached is not None and cached['generation'] == generation:
+        return cached['entries']
+    posts = posts.select_related('author', 'group')
+    entries = None
+    if cached is not None and cached['entries']:
+        entries = {entry['pk']: entry for entry in cached['entries']}
+        since = max(entry['updated'] for entry in entries.values())
+        kept = set(posts.filter(pk__in=list(entries)).values_list(
+            'pk', flat=True
+        ))
+        entries = {pk: entry for pk, entry in entries.items() if pk in kept}
+        for post in posts.filter(updated__gt=since)[:feed_size]:
+            entries[post.pk] = _entry(post)
+        entries = sorted(
+            entries.values(),
+            key=lambda entry: (entry['pub_date'], entry['pk']),
+            reverse=True
+        )[:feed_size]
+        # После удаления хвост ленты пришлось бы догружать: проще заново.
+        if len(entries) < min(feed_size, len(cached['entries'])):
+            entries = None
+    if entries is None:
+        entries = [_entry(post) for post in posts[:feed_size]]
+    cache.set(
+        key, {'generation': generation, 'entries': entries}, FEED_TIMEOUT
+    )
+    return entries
+
+
+def render_feed(request, kind, entries, title, link, description):
+    feed = FORMATS[kind](
+        title=title,
+        link=request.build_absolute_uri(link),
+        description=description,
+        feed_url=request.build_absolute_uri(request.path),
+        language='ru',
+    )
+    for entry in entries:
+        url = request.build_absolute_uri(
+            reverse('posts:post_detail', args=[entry['pk']])
+        )
+        feed.add_item(
+            title=Truncator(entry['text']).chars(50),
+            link=url,
+            description=entry['text'],
+            unique_id=url,
+            author_name=entry['author'],
+            pubdate=entry['pub_date'],
+            updateddate=entry['updated'],
+            categories=[entry['group']] if entry['group'] else [],
+        )
+    return feed.writeString('utf-8'), feed.content_type
+
+
+def feed_response(request, kind, listing, posts, title, link,
+                  description=''):
+    """
+    Лента в формате kind. Готовый документ лежит в кэше
+    до смены поколения ленты, так что опрос стоит одного чтения кэша.
+    """
+    if kind not in FORMATS:
+        raise Http404('Неизвестный формат ленты')
+    generation = get_generation(listing)
+    modified = get_modified(listing)
+    url = request.build_absolute_uri(request.path)
+    etag = md5(repr((url, generation)).encode()).hexdigest()
+    last_modified = int(modified) if modified is not None else None
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    content, content_type = get_or_compute(
+        f'feed:body:{etag}',
+        lambda: render_feed(
+            request, kind, get_entries(posts, listing), title, link,
+            description
+        ),
+        FEED_TIMEOUT
+    )
+    return add_validators(
+        HttpResponse(content, content_type=content_type),
+        etag, last_modified
+    )
@@ -1,5 +1,9 @@
+import os
+
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
 from django.forms import ModelForm
 
+from . import images
 from .models import Post, Comment
 
 
@@ -13,6 +17,25 @@ class PostForm(ModelForm):
         }
         fields = ['group', 'text', 'image']
 
+    def clean_image(self):
+        """Новая картинка ужимается и очищается от метаданных."""
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        image.seek(0)
+        result = images.normalize(image.read())
+        images.log_result(image.name, result)
+        name = image.name
+        content_type = image.content_type
+        if result.extension:
+            name = os.path.splitext(name)[0] + result.extension
+            content_type = f'image/{result.extension[1:]}'.replace(
+                'jpg', 'jpeg'
+            )
+        # WebP-копию сохраняет сигнал, когда станет известно имя файла.
+        self.instance._webp = result.webp
+        return SimpleUploadedFile(name, result.data, content_type)
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F
+
+from core.db import run_write
+
+from .models import Post, PostStats, UserStats
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = Counter()
+_last_flush = time.monotonic()
+
+
+def record(post):
+    """Учитывает просмотр поста в памяти процесса, без записи в базу."""
+    with _lock:
+        _pending[(post.pk, post.author_id)] += 1
+
+
+def pending():
+    """Еще не записанные просмотры: {id поста: число}."""
+    with _lock:
+        totals = Counter()
+        for (post_id, _), count in _pending.items():
+            totals[post_id] += count
+        return totals
+
+
+def is_due():
+    with _lock:
+        if not _pending:
+            return False
+        size = sum(_pending.values())
+    return (
+        size >= getattr(settings, 'VIEW_COUNTER_FLUSH_SIZE', 100)
+        or time.monotonic() - _last_flush
+        >= getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 10)
+    )
+
+
+def _add(queryset, field, deltas):
+    # Один UPDATE на каждое различное приращение, а не на каждую строку.
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        queryset.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def _write_batch(posts, authors):
+    existing = set(Post.objects.filter(
+        pk__in=list(posts)
+    ).values_list('pk', flat=True))
+    posts = {pk: posts[pk] for pk in existing}
+    PostStats.objects.bulk_create(
+        [PostStats(post_id=pk) for pk in posts], ignore_conflicts=True
+    )
+    _add(PostStats.objects, 'views_count', posts)
+    _add(UserStats.objects, 'views_count', authors)
+    return posts
+
+
+def flush():
+    """
+    Записывает накопленные просмотры пачкой; возвращает их число.
+    Запись идет через core.db.run_write уже после ответа; если база
+    так и не освободилась или процесс остановлен, теряется не больше
+    одной пачки.
+    """
+    global _last_flush
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not batch:
+        return 0
+    posts, authors = Counter(), Counter()
+    for (post_id, author_id), count in batch.items():
+        posts[post_id] += count
+        authors[author_id] += count
+    try:
+        posts = run_write(_write_batch, posts, authors)
+    except DatabaseError:
+        logger.exception('Не удалось записать %s просмотров', len(batch))
+        return 0
+    return sum(posts.values())
+
+
+def flush_if_due(**kwargs):
+    if is_due():
+        flush()
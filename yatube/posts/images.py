@@ -0,0 +1,107 @@
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from .constants import image_max_side, image_quality
+
+logger = logging.getLogger(__name__)
+
+# Форматы, которые сохраняются как есть; остальные приводятся к JPEG/PNG.
+KEEP_FORMATS = {'JPEG', 'PNG', 'GIF'}
+WEBP = features.check('webp')
+ORIENTATION = 0x0112
+
+
+class Result:
+    """Итог обработки: новые байты, расширение и WebP-копия."""
+
+    def __init__(self, data, extension, webp, original_size):
+        self.data = data
+        self.extension = extension
+        self.webp = webp
+        self.original_size = original_size
+
+    @property
+    def saved(self):
+        return self.original_size - len(self.data)
+
+
+def _encode(image, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def normalize(data):
+    """
+    Уменьшает картинку до image_max_side, поворачивает по EXIF,
+    выбрасывает метаданные и перекодирует. Анимация не трогается.
+    """
+    image = Image.open(BytesIO(data))
+    source_format = image.format
+    if getattr(image, 'is_animated', False):
+        return Result(data, None, None, len(data))
+    changed = bool(image.info.get('exif') or image.info.get('icc_profile'))
+    # exif_transpose всегда возвращает новый объект, поэтому поворот
+    # определяется по тегу Orientation.
+    if image.getexif().get(ORIENTATION) not in (None, 1):
+        changed = True
+    image = ImageOps.exif_transpose(image)
+    if max(image.size) > image_max_side:
+        image.thumbnail((image_max_side, image_max_side), Image.LANCZOS)
+        changed = True
+
+    image_format = source_format
+    if image_format not in KEEP_FORMATS:
+        image_format = 'PNG' if _has_alpha(image) else 'JPEG'
+    if image_format == 'JPEG':
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        encoded = _encode(
+            image, 'JPEG',
+            quality=image_quality, optimize=True, progressive=True
+        )
+    else:
+        encoded = _encode(image, image_format, optimize=True)
+    # Перекодированная картинка без изменений размера и метаданных
+    # оказалась тяжелее: оставляем исходник.
+    if len(encoded) >= len(data) and not changed and (
+        image_format == source_format
+    ):
+        encoded = data
+
+    webp = None
+    if WEBP:
+        webp = _encode(image, 'WEBP', quality=image_quality, method=6)
+    extension = None
+    if image_format != source_format:
+        extension = '.jpg' if image_format == 'JPEG' else '.png'
+    return Result(encoded, extension, webp, len(data))
+
+
+def webp_name(name):
+    return os.path.splitext(name)[0] + '.webp'
+
+
+def save_webp(name, data):
+    """Кладет WebP-копию рядом с оригиналом."""
+    sibling = webp_name(name)
+    if default_storage.exists(sibling):
+        default_storage.delete(sibling)
+    default_storage.save(sibling, BytesIO(data))
+
+
+def log_result(name, result):
+    logger.info(
+        'Картинка %s: %d -> %d байт, сэкономлено %d',
+        name, result.original_size, len(result.data), result.saved
+    )
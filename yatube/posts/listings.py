@@ -0,0 +1,134 @@
+import time
+from itertools import islice
+
+from django.core.cache import cache
+
+from core.routers import read_primary
+from core.stampede import get_or_compute
+
+from .constants import limitation
+from .models import Post
+from .utils import CursorPaginator, get_page
+
+LISTING_TIMEOUT = 60 * 5
+POST_TIMEOUT = 60 * 5
+
+
+def _generation_key(listing):
+    return f'listing:generation:{listing}'
+
+
+def _modified_key(listing):
+    return f'listing:modified:{listing}'
+
+
+def _post_key(pk):
+    return f'listing:post:{pk}'
+
+
+def listings_for(post, group_id=None):
+    """Ленты, в которых показывается пост."""
+    listings = {'index', f'author:{post.author_id}'}
+    for pk in (post.group_id, group_id):
+        if pk is not None:
+            listings.add(f'group:{pk}')
+    return listings
+
+
+def get_generation(listing):
+    key = _generation_key(listing)
+    # Начальное значение из часов: после вытеснения ключа поколение
+    # не совпадет ни с одним из ранее закэшированных.
+    cache.add(key, int(time.time() * 1000), None)
+    return cache.get(key)
+
+
+def bump_generation(listing):
+    """Сбрасывает все закэшированные страницы ленты."""
+    key = _generation_key(listing)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+    cache.set(_modified_key(listing), time.time(), None)
+
+
+def get_modified(listing):
+    """Время последнего изменения ленты или None, если оно неизвестно."""
+    return cache.get(_modified_key(listing))
+
+
+def forget_post(pk):
+    cache.delete(_post_key(pk))
+
+
+def cards_changed(posts):
+    """
+    Сбрасывает ленты и кэш постов, чьи карточки показывают измененные
+    данные вне самого поста: имя автора или название группы.
+    """
+    rows = posts.order_by().values_list('pk', 'author_id', 'group_id')
+    rows = rows.iterator()
+    touched = set()
+    while True:
+        batch = list(islice(rows, 1000))
+        if not batch:
+            break
+        cache.delete_many([_post_key(pk) for pk, _, _ in batch])
+        touched.add('index')
+        for _, author_id, group_id in batch:
+            touched.add(f'author:{author_id}')
+            if group_id is not None:
+                touched.add(f'group:{group_id}')
+    for listing in touched:
+        bump_generation(listing)
+
+
+def hydrate(ids):
+    """Достает посты по id: сначала из кэша, остальные одним in_bulk."""
+    keys = {_post_key(pk): pk for pk in ids}
+    found = {keys[key]: post for key, post in cache.get_many(keys).items()}
+    missing = [pk for pk in ids if pk not in found]
+    if missing:
+        # В общий кэш — только данные primary.
+        with read_primary():
+            fetched = Post.objects.select_related(
+                'author', 'group'
+            ).in_bulk(missing)
+        cache.set_many(
+            {_post_key(pk): post for pk, post in fetched.items()},
+            POST_TIMEOUT
+        )
+        found.update(fetched)
+    return [found[pk] for pk in ids if pk in found]
+
+
+def get_listing_page(posts, request, listing):
+    """
+    Страница ленты через кэш списка id.
+
+    Упорядоченные id страницы хранятся под ключом текущего поколения
+    ленты, так что горячие страницы не пересортировывают таблицу,
+    а посты по большей части берутся из кэша объектов.
+    Старые ссылки ?page=N обслуживаются без кэша страниц, но число
+    постов для них кэшируется под тем же поколением.
+    """
+    if request.GET.get('page') is not None:
+        return get_page(
+            posts.select_related('author', 'group'), request,
+            count_key=f'listing:{listing}:{get_generation(listing)}:count'
+        )
+    token = request.GET.get('cursor') or ''
+    key = f'listing:{listing}:{get_generation(listing)}:{token}'
+    # Внешние ключи нужны related-менеджерам группы и автора,
+    # иначе они догружают их отдельным запросом на каждую строку.
+    paginator = CursorPaginator(
+        posts.only('id', 'pub_date', 'author', 'group'), limitation
+    )
+
+    def compute():
+        page = paginator.cursor_page(token)
+        return paginator.state(), [post.pk for post in page]
+
+    state, ids = get_or_compute(key, compute, LISTING_TIMEOUT)
+    return paginator.restore_page(state, hydrate(ids))
@@ -0,0 +1,11 @@
+from time import perf_counter
+
+
+def measure(func, repeat):
+    """Лучшее время вызова func из repeat попыток, в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+    return min(timings) * 1000
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+
+from posts.constants import limitation
+from posts.management.benchmark import measure
+from posts.models import Post
+from posts.utils import NEXT, CursorPaginator, encode_cursor
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время выборки страницы ленты через OFFSET/COUNT '
+        'и через курсор на текущих данных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', nargs='+', type=int, default=[1, 10, 100, 1000],
+            help='Номера страниц, на которых делается замер.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз повторять каждый замер.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.all()
+        if not posts.exists():
+            raise CommandError('В базе нет постов для замера.')
+        self.stdout.write(f'{"page":>8} {"offset, ms":>12} {"cursor, ms":>12}')
+        for number in options['pages']:
+            depth = (number - 1) * limitation
+            token = None
+            if depth:
+                anchor = posts.order_by('-pub_date', '-id').values_list(
+                    'pub_date', 'id'
+                )[depth - 1:depth]
+                if not anchor:
+                    self.stdout.write(f'{number:>8} {"нет данных":>12}')
+                    continue
+                token = encode_cursor(NEXT, *anchor[0])
+
+            def offset_page():
+                paginator = Paginator(posts, limitation)
+                list(paginator.page(number).object_list)
+
+            def cursor_page():
+                paginator = CursorPaginator(posts, limitation)
+                list(paginator.cursor_page(token))
+
+            offset_ms = measure(offset_page, options['repeat'])
+            cursor_ms = measure(cursor_page, options['repeat'])
+            self.stdout.write(
+                f'{number:>8} {offset_ms:>12.2f} {cursor_ms:>12.2f}'
+            )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from posts.constants import limitation
+from posts.management.benchmark import measure
+from posts.models import Post
+from posts.search import SearchResults, has_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время первой страницы поиска через FTS5 '
+        'и через LIKE (icontains) на текущих данных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('words', nargs='+', help='Поисковые запросы.')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз повторять каждый замер.'
+        )
+
+    def handle(self, *args, **options):
+        if not has_index():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite.')
+        self.stdout.write(f'{"query":>20} {"like, ms":>12} {"fts, ms":>12}')
+        for word in options['words']:
+
+            def like_page():
+                list(Post.objects.filter(
+                    Q(text__icontains=word) | Q(comments__text__icontains=word)
+                ).distinct()[:limitation])
+
+            def fts_page():
+                SearchResults(word)[:limitation]
+
+            like_ms = measure(like_page, options['repeat'])
+            fts_ms = measure(fts_page, options['repeat'])
+            self.stdout.write(f'{word:>20} {like_ms:>12.2f} {fts_ms:>12.2f}')
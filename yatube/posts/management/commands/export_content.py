@@ -0,0 +1,55 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import FORMATS, TYPES, export_stream
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает группы, посты, комментарии и подписки '
+        'в JSONL или CSV (при желании в gzip) в формате import_content.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл для выгрузки.')
+        parser.add_argument(
+            '--format', choices=FORMATS, default=None,
+            help='jsonl или csv; по умолчанию по расширению файла.'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжимать выгрузку (по умолчанию для файлов .gz).'
+        )
+        parser.add_argument(
+            '--types', default=','.join(TYPES),
+            help='Что выгружать, через запятую.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        name = path[:-3] if path.endswith('.gz') else path
+        export_format = options['format'] or (
+            'csv' if name.endswith('.csv') else 'jsonl'
+        )
+        types = [kind.strip() for kind in options['types'].split(',')]
+        unknown = set(types) - set(TYPES)
+        if unknown:
+            raise CommandError(f'Неизвестные типы: {", ".join(unknown)}')
+        start = perf_counter()
+        size = 0
+        with open(path, 'wb') as file:
+            for chunk in export_stream(
+                export_format, types,
+                compress=options['gzip'] or path.endswith('.gz'),
+                chunk_size=options['chunk_size'],
+            ):
+                file.write(chunk)
+                size += len(chunk)
+        self.stdout.write(
+            f'Записано {size} байт за {perf_counter() - start:.1f} с'
+        )
@@ -0,0 +1,48 @@
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+def init_worker():
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит миниатюры для уже загруженных картинок постов '
+        'параллельно на всех ядрах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=cpu_count(),
+            help='Число процессов.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=20,
+            help='Сколько картинок отдавать процессу за раз.'
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='').exclude(image__isnull=True)
+            .order_by('pk').values_list('image', flat=True)
+        )
+        # Соединение с базой нельзя делить между процессами.
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=options['workers'], initializer=init_worker
+        ) as executor:
+            done = sum(executor.map(
+                generate, names, chunksize=options['chunk_size']
+            ))
+        self.stdout.write(
+            f'Картинок: {len(names)}, миниатюр построено: {done}'
+        )
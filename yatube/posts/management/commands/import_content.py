@@ -0,0 +1,280 @@
+import csv
+import json
+import os
+from collections import defaultdict
+from contextlib import ExitStack
+from itertools import islice
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import counters, listings, timeline
+from posts.bulk import deferred_indexes, keep_dates, max_pk
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def read_records(path):
+    """Построчно читает JSONL или CSV; пустые ячейки CSV считаются None."""
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(file):
+                yield {key: value or None for key, value in row.items()}
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise CommandError(f'Неверная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def batches(items, size=500):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково импортирует группы, посты, комментарии и подписки '
+        'из JSONL или CSV. Каждая запись содержит поле type: '
+        'group (slug, title, description), post (id, author, group, text, '
+        'pub_date), comment (post, author, text, created) или follow '
+        '(user, author). Авторы задаются username, группы — slug, '
+        'комментарии ссылаются на id поста из того же файла.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .csv.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Сколько записей вставлять в одной транзакции.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Размер пачки bulk_create.'
+        )
+        parser.add_argument(
+            '--defer-indexes', action='store_true',
+            help='Снять индексы на время импорта и построить их после.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с контрольной точки после сбоя.'
+        )
+
+    def load_checkpoint(self, path, resume):
+        """Число уже импортированных записей и id постов из файла."""
+        done, refs = 0, {}
+        if not os.path.exists(path):
+            return done, refs
+        if not resume:
+            raise CommandError(
+                f'Найдена контрольная точка {path}: запустите с --resume '
+                'или удалите ее.'
+            )
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                state = json.loads(line)
+                done = state['done']
+                refs.update(state['posts'])
+        return done, refs
+
+    def resolve_users(self, usernames):
+        missing = set(usernames) - set(self.users) - {None}
+        if missing:
+            User.objects.bulk_create(
+                [
+                    User(username=name, password=make_password(None))
+                    for name in missing
+                ],
+                batch_size=self.batch_size
+            )
+            created = dict(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'pk'))
+            self.users.update(created)
+            self.touched_users.update(created.values())
+
+    def group_id(self, slug):
+        if slug is None:
+            return None
+        if slug not in self.groups:
+            raise CommandError(f'Неизвестная группа: {slug}')
+        return self.groups[slug]
+
+    def post_id(self, ref):
+        if str(ref) not in self.refs:
+            raise CommandError(f'Неизвестный пост: {ref}')
+        return self.refs[str(ref)]
+
+    def import_chunk(self, chunk):
+        """Вставляет записи одной транзакцией; возвращает новые id постов."""
+        by_type = defaultdict(list)
+        for record in chunk:
+            by_type[record['type']].append(record)
+        new_refs = {}
+        with transaction.atomic():
+            groups = [
+                Group(
+                    slug=record['slug'], title=record['title'],
+                    description=record.get('description') or ''
+                )
+                for record in by_type['group']
+                if record['slug'] not in self.groups
+            ]
+            Group.objects.bulk_create(groups, batch_size=self.batch_size)
+            self.groups.update(Group.objects.filter(
+                slug__in=[group.slug for group in groups]
+            ).values_list('slug', 'pk'))
+
+            self.resolve_users(
+                record.get(field)
+                for kind, fields in (
+                    ('post', ('author',)),
+                    ('comment', ('author',)),
+                    ('follow', ('user', 'author')),
+                )
+                for record in by_type[kind]
+                for field in fields
+            )
+
+            posts = []
+            for record in by_type['post']:
+                self.next_pk += 1
+                if record.get('id') is not None:
+                    new_refs[str(record['id'])] = self.next_pk
+                date = parse_date(record.get('pub_date'))
+                posts.append(Post(
+                    pk=self.next_pk, text=record['text'],
+                    author_id=self.users[record['author']],
+                    group_id=self.group_id(record.get('group')),
+                    pub_date=date, updated=date,
+                ))
+            Post.objects.bulk_create(posts, batch_size=self.batch_size)
+            self.refs.update(new_refs)
+            self.touched_users.update(post.author_id for post in posts)
+            self.touched_groups.update(
+                post.group_id for post in posts if post.group_id
+            )
+
+            comments = [
+                Comment(
+                    post_id=self.post_id(record['post']),
+                    author_id=self.users[record['author']],
+                    text=record['text'],
+                    created=parse_date(record.get('created')),
+                )
+                for record in by_type['comment']
+            ]
+            Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+            self.commented.update(comment.post_id for comment in comments)
+
+            follows = [
+                Follow(
+                    user_id=self.users[record['user']],
+                    author_id=self.users[record['author']],
+                )
+                for record in by_type['follow']
+                if record['user'] != record['author']
+            ]
+            Follow.objects.bulk_create(
+                follows, batch_size=self.batch_size, ignore_conflicts=True
+            )
+            for follow in follows:
+                self.follows[follow.author_id].add(follow.user_id)
+                self.touched_users.update((follow.user_id, follow.author_id))
+        return new_refs
+
+    def finish(self):
+        """
+        bulk_create не вызывает сигналы, поэтому ленты, счетчики
+        и поколения кэша обновляются здесь одним проходом.
+        """
+        with transaction.atomic():
+            self.update_derived()
+
+    def update_derived(self):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Post]):
+                cursor.execute(sql)
+        # Счетчики первыми: у новых авторов появляются строки UserStats.
+        for batch in batches(self.touched_users):
+            counters.recount_users(batch)
+        for batch in batches(self.follows):
+            timeline.mark_pull_authors(batch)
+        cache.delete(timeline.PULL_AUTHORS_KEY)
+        pull_authors = timeline.get_pull_authors()
+        timeline.fan_out_since(self.first_pk)
+        # Новые посты уже разложены выше, остается догрузить старые.
+        for author_id, user_ids in self.follows.items():
+            if author_id not in pull_authors:
+                timeline.backfill(user_ids, author_id, until_pk=self.first_pk)
+        for batch in batches(self.commented):
+            counters.recount_posts(batch)
+        listings.bump_generation('index')
+        for group_id in self.touched_groups:
+            listings.bump_generation(f'group:{group_id}')
+        for user_id in self.touched_users:
+            listings.bump_generation(f'author:{user_id}')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint = path + '.checkpoint'
+        done, self.refs = self.load_checkpoint(checkpoint, options['resume'])
+        self.batch_size = options['batch_size']
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.touched_users = set()
+        self.touched_groups = set()
+        self.commented = set()
+        self.follows = defaultdict(set)
+        self.first_pk = self.next_pk = max_pk(Post)
+        records = islice(read_records(path), done, None)
+        imported = 0
+        start = perf_counter()
+        with ExitStack() as stack:
+            stack.enter_context(keep_dates(
+                Post._meta.get_field('pub_date'),
+                Post._meta.get_field('updated'),
+                Comment._meta.get_field('created'),
+            ))
+            # Даже после сбоя вставленное раньше попадет в ленты и счетчики.
+            # Вызывается последним, когда индексы уже построены заново.
+            stack.callback(self.finish)
+            if options['defer_indexes']:
+                stack.enter_context(deferred_indexes(Post, Comment, Follow))
+            for chunk in batches(records, options['chunk_size']):
+                new_refs = self.import_chunk(chunk)
+                done += len(chunk)
+                imported += len(chunk)
+                with open(checkpoint, 'a', encoding='utf-8') as file:
+                    file.write(
+                        json.dumps({'done': done, 'posts': new_refs}) + '\n'
+                    )
+                rate = imported / (perf_counter() - start)
+                self.stdout.write(f'Записей: {done}, {rate:.0f} в секунду')
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано записей: {imported} за {elapsed:.1f} с, '
+            f'{imported / max(elapsed, 1e-6):.0f} в секунду'
+        ))
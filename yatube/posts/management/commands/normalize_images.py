@@ -0,0 +1,69 @@
+from io import BytesIO
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts import images, listings
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Ужимает уже загруженные картинки постов так же, как форма '
+        'при загрузке, и сообщает, сколько места освободилось.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать экономию, ничего не записывая.'
+        )
+
+    def replace(self, name, result):
+        """
+        Сначала пишет новый файл и ссылки на него, старый удаляет
+        последним: сбой на любом шаге не оставит пост без картинки.
+        """
+        new_name = name
+        if result.extension:
+            new_name = name.rsplit('.', 1)[0] + result.extension
+        new_name = default_storage.save(new_name, BytesIO(result.data))
+        if result.webp:
+            images.save_webp(new_name, result.webp)
+        moved = Post.objects.filter(image=name)
+        pks = list(moved.values_list('pk', flat=True))
+        try:
+            moved.update(image=new_name)
+        except Exception:
+            default_storage.delete(new_name)
+            if result.webp:
+                default_storage.delete(images.webp_name(new_name))
+            raise
+        for pk in pks:
+            listings.forget_post(pk)
+        default_storage.delete(name)
+        old_webp = images.webp_name(name)
+        if old_webp != images.webp_name(new_name):
+            default_storage.delete(old_webp)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).order_by('pk').values_list('image', flat=True)
+        total = saved = 0
+        for name in posts.iterator():
+            if not default_storage.exists(name):
+                continue
+            with default_storage.open(name) as file:
+                result = images.normalize(file.read())
+            total += 1
+            if result.saved <= 0 and not result.extension:
+                continue
+            saved += result.saved
+            images.log_result(name, result)
+            if options['dry_run']:
+                continue
+            self.replace(name, result)
+        self.stdout.write(
+            f'Картинок: {total}, сэкономлено байт: {saved}'
+        )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount_posts, recount_users
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счетчики постов, комментариев '
+        'и подписок пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк пересчитывать за один проход.'
+        )
+
+    def recount(self, queryset, recount, batch_size):
+        last_pk = 0
+        total = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by(
+                'pk'
+            ).values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return total
+            with transaction.atomic():
+                recount(batch)
+            total += len(batch)
+            last_pk = batch[-1]
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        users = self.recount(User.objects.all(), recount_users, batch_size)
+        self.stdout.write(f'Пользователей пересчитано: {users}')
+        posts = self.recount(Post.objects.all(), recount_posts, batch_size)
+        self.stdout.write(f'Постов пересчитано: {posts}')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import resumable_authors, resume_fan_out
+
+
+class Command(BaseCommand):
+    help = (
+        'Возвращает к раскладке по лентам авторов, у которых подписчиков '
+        'стало меньше fanout_resume_limit. Запускается по расписанию: '
+        'отписка сама ленты не заполняет.'
+    )
+
+    def handle(self, *args, **options):
+        authors = list(resumable_authors())
+        for author_id in authors:
+            resume_fan_out(author_id)
+        self.stdout.write(f'Авторов возвращено к раскладке: {len(authors)}')
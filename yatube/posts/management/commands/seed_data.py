@@ -0,0 +1,116 @@
+import json
+import os
+import random
+import tempfile
+from datetime import timedelta
+from itertools import accumulate
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from faker import Faker
+
+# Сколько разных текстов заготовить: Faker на каждую запись слишком медленный.
+TEXT_POOL = 5000
+
+
+def zipf_weights(count, skew):
+    """Накопленные веса Ципфа: немногие популярны, большинство — нет."""
+    return list(accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными для нагрузочных замеров: '
+        'пользователи, группы, посты, комментарии и подписки '
+        'с перекосом по популярности авторов. Данные вставляются '
+        'через import_content.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя.'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель распределения Ципфа для популярности авторов.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до текущего момента распределить посты.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=20000)
+
+    def records(self, options):
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+        rnd = random.Random(options['seed'])
+        pool = min(TEXT_POOL, options['posts'] + options['comments'] + 1)
+        texts = [fake.paragraph(nb_sentences=4) for _ in range(pool)]
+        comments = [fake.sentence() for _ in range(pool)]
+        users = [
+            f'{fake.user_name()}_{number}'
+            for number in range(options['users'])
+        ]
+        groups = [f'group-{number}' for number in range(options['groups'])]
+        for slug in groups:
+            yield {'type': 'group', 'slug': slug,
+                   'title': fake.catch_phrase()[:200],
+                   'description': fake.paragraph()}
+
+        weights = zipf_weights(len(users), options['skew'])
+        now = timezone.now()
+        span = options['days'] * 24 * 60 * 60
+        # Посты идут по возрастанию даты, как если бы писались подряд.
+        for number in range(options['posts']):
+            seconds = span * (options['posts'] - number) / options['posts']
+            yield {
+                'type': 'post', 'id': number,
+                'author': rnd.choices(users, cum_weights=weights)[0],
+                'group': rnd.choice(groups) if groups and rnd.random() < 0.7
+                else None,
+                'text': rnd.choice(texts),
+                'pub_date': (now - timedelta(seconds=seconds)).isoformat(),
+            }
+        for _ in range(options['comments']):
+            # Обсуждают в основном свежие посты.
+            post = int(options['posts'] * rnd.random() ** 0.3)
+            yield {
+                'type': 'comment', 'post': min(post, options['posts'] - 1),
+                'author': rnd.choice(users), 'text': rnd.choice(comments),
+            }
+        # Популярность у читателей не совпадает с плодовитостью:
+        # иначе самые пишущие авторы получают и всех подписчиков,
+        # а ленты раздуваются до произведения двух перекосов.
+        readers_choice = users[:]
+        rnd.shuffle(readers_choice)
+        for user in users:
+            count = min(
+                len(users) - 1, int(rnd.expovariate(1 / options['follows']))
+            )
+            authors = set(
+                rnd.choices(readers_choice, cum_weights=weights, k=count)
+            )
+            for author in authors - {user}:
+                yield {'type': 'follow', 'user': user, 'author': author}
+
+    def handle(self, *args, **options):
+        if not options['posts']:
+            options['comments'] = 0
+        handle, path = tempfile.mkstemp(suffix='.jsonl')
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8') as file:
+                for record in self.records(options):
+                    file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            call_command(
+                'import_content', path, chunk_size=options['chunk_size'],
+                stdout=self.stdout
+            )
+        finally:
+            os.remove(path)
@@ -0,0 +1,67 @@
+from django.db import migrations
+
+# Ё приводится к Е и в индексе, и в запросах (см. posts.search).
+NORMALIZE = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+
+FORWARD = [
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "text, content='', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE posts_comment_fts USING fts5("
+    "text, content='', tokenize='unicode61 remove_diacritics 2')",
+]
+for table in ('post', 'comment'):
+    new_text = NORMALIZE.format('new.text')
+    old_text = NORMALIZE.format('old.text')
+    FORWARD += [
+        f"CREATE TRIGGER posts_{table}_fts_insert AFTER INSERT "
+        f"ON posts_{table} BEGIN "
+        f"INSERT INTO posts_{table}_fts(rowid, text) "
+        f"VALUES (new.id, {new_text}); END",
+        f"CREATE TRIGGER posts_{table}_fts_delete AFTER DELETE "
+        f"ON posts_{table} BEGIN "
+        f"INSERT INTO posts_{table}_fts(posts_{table}_fts, rowid, text) "
+        f"VALUES ('delete', old.id, {old_text}); END",
+        f"CREATE TRIGGER posts_{table}_fts_update AFTER UPDATE OF text "
+        f"ON posts_{table} BEGIN "
+        f"INSERT INTO posts_{table}_fts(posts_{table}_fts, rowid, text) "
+        f"VALUES ('delete', old.id, {old_text}); "
+        f"INSERT INTO posts_{table}_fts(rowid, text) "
+        f"VALUES (new.id, {new_text}); END",
+        f"INSERT INTO posts_{table}_fts(rowid, text) "
+        f"SELECT id, {NORMALIZE.format('text')} FROM posts_{table}",
+    ]
+
+BACKWARD = [
+    f'DROP TRIGGER IF EXISTS posts_{table}_fts_{action}'
+    for table in ('post', 'comment')
+    for action in ('insert', 'delete', 'update')
+] + [
+    'DROP TABLE IF EXISTS posts_post_fts',
+    'DROP TABLE IF EXISTS posts_comment_fts',
+]
+
+
+def execute(schema_editor, statements):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in statements:
+        schema_editor.execute(sql, params=None)
+
+
+def create_search_index(apps, schema_editor):
+    execute(schema_editor, FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    execute(schema_editor, BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,43 @@
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+search_index = import_module('posts.migrations.0010_search_index')
+
+
+def fill_updated(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated=F('pub_date'))
+
+
+def restore_triggers(apps, schema_editor):
+    # SQLite добавляет столбец через пересоздание таблицы,
+    # а вместе со старой таблицей пропадают и триггеры поиска.
+    search_index.execute(schema_editor, [
+        sql for sql in search_index.BACKWARD + search_index.FORWARD
+        if sql.startswith(('DROP TRIGGER', 'CREATE TRIGGER'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(
+                auto_now=True, default=timezone.now,
+                verbose_name='Дата изменения'
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_updated, migrations.RunPython.noop),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
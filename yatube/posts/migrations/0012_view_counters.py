@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostStats',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Post')),
+                ('views_count', models.PositiveIntegerField(default=0, verbose_name='Просмотры')),
+            ],
+            options={
+                'verbose_name_plural': 'Счетчики постов',
+            },
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Просмотры постов'),
+        ),
+    ]
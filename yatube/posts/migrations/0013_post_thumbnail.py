@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:33
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+post_updated = import_module('posts.migrations.0011_post_updated')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_view_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            migrations.RunPython.noop, post_updated.restore_triggers
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Миниатюра'),
+        ),
+        migrations.RunPython(
+            post_updated.restore_triggers, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:56
+
+from django.db import migrations, models
+from django.db.models import Count
+
+from posts.constants import fanout_limit
+
+
+def mark_pull_authors(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    authors = Follow.objects.values('author').annotate(
+        followers=Count('user')
+    ).filter(followers__gte=fanout_limit).values_list('author', flat=True)
+    UserStats.objects.filter(user_id__in=list(authors)).update(
+        timeline_pull=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='timeline_pull',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Лента без раскладки'),
+        ),
+        migrations.RunPython(mark_pull_authors, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.db import models
 
 User = get_user_model()
@@ -22,6 +23,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -44,15 +49,40 @@ class Post(models.Model):
         verbose_name='Изображение',
         help_text='Выберите изображение'
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    # Миниатюра для карточки, построенная пулом (posts.thumbnails):
+    # шаблону не нужно искать ее в хранилище sorl.
+    thumbnail = models.CharField(
+        'Миниатюра',
+        max_length=255,
+        blank=True,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=('-pub_date', '-id'),
+                         name='post_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='post_author_date_idx'),
+            models.Index(fields=('group', '-pub_date', '-id'),
+                         name='post_group_date_idx'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def thumbnail_url(self):
+        return default_storage.url(self.thumbnail)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -77,6 +107,12 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=('post', 'created', 'id'),
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -95,4 +131,76 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=('user', 'author'),
                                     name='Пара уникальных значений')
         ]
+        indexes = [
+            models.Index(fields=('author', 'user'),
+                         name='follow_author_user_idx'),
+        ]
         verbose_name_plural = 'Пользователи / Подписки'
+
+
+class TimelineEntry(models.Model):
+    """Материализованная запись ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=('user', '-pub_date', '-post'),
+                         name='timeline_user_date_idx'),
+        ]
+        verbose_name_plural = 'Ленты подписок'
+
+
+class UserStats(models.Model):
+    """Денормализованные счетчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+    views_count = models.PositiveIntegerField(
+        'Просмотры постов', default=0
+    )
+    # Посты автора не раскладываются по лентам, а читаются при запросе.
+    timeline_pull = models.BooleanField(
+        'Лента без раскладки', default=False, db_index=True
+    )
+
+    class Meta:
+        verbose_name_plural = 'Счетчики пользователей'
+
+
+class PostStats(models.Model):
+    """
+    Счетчик просмотров поста. Вынесен из Post, чтобы частые
+    обновления не трогали строки постов и их поисковый индекс.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    views_count = models.PositiveIntegerField('Просмотры', default=0)
+
+    class Meta:
+        verbose_name_plural = 'Счетчики постов'
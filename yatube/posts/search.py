@@ -0,0 +1,175 @@
+import re
+from importlib import import_module
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Q
+
+from .models import Post
+
+search_index = import_module('posts.migrations.0010_search_index')
+# Триггеры по именам и запросы, заново заполняющие индекс.
+TRIGGERS = {
+    sql.split()[2]: sql for sql in search_index.FORWARD
+    if sql.startswith('CREATE TRIGGER')
+}
+REINDEX = [
+    sql for sql in search_index.FORWARD if sql.startswith('INSERT INTO')
+]
+
+WORD = re.compile(r'\w+')
+# Грубый стемминг: окончание отбрасывается, а слово ищется по префиксу,
+# так что "котами" находит и "кот", и "котов".
+ENDING = re.compile(
+    r'(ами|ями|ого|его|ому|ему|ыми|ими|ах|ях|ам|ям|ов|ев|ей|ой|ий|ый|ая|яя'
+    r'|ое|ее|ые|ие|ом|ем|ую|юю|а|я|о|е|ы|и|у|ю|ь)$'
+)
+# Совпадение в комментарии весит меньше совпадения в тексте поста.
+COMMENT_WEIGHT = 0.5
+
+SEARCH_SQL = '''
+    SELECT post_id FROM (
+        SELECT rowid AS post_id, bm25(posts_post_fts) AS score
+        FROM posts_post_fts WHERE posts_post_fts MATCH %s
+        UNION ALL
+        SELECT comment.post_id, bm25(posts_comment_fts) * %s
+        FROM posts_comment_fts
+        JOIN posts_comment AS comment
+            ON comment.id = posts_comment_fts.rowid
+        WHERE posts_comment_fts MATCH %s
+    )
+    GROUP BY post_id ORDER BY MIN(score), post_id DESC
+    LIMIT %s OFFSET %s
+'''
+COUNT_SQL = '''
+    SELECT COUNT(*) FROM (
+        SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s
+        UNION
+        SELECT comment.post_id
+        FROM posts_comment_fts
+        JOIN posts_comment AS comment
+            ON comment.id = posts_comment_fts.rowid
+        WHERE posts_comment_fts MATCH %s
+    )
+'''
+POST_IDS_SQL = (
+    'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s'
+)
+
+
+def match_query(text):
+    """Переводит пользовательский ввод в безопасный запрос FTS5."""
+    terms = []
+    for word in WORD.findall(text.replace('ё', 'е').replace('Ё', 'Е')):
+        word = word.lower()
+        stem = ENDING.sub('', word)
+        terms.append(f'"{stem if len(stem) >= 3 else word}"*')
+    return ' '.join(terms)
+
+
+def has_index():
+    return connection.vendor == 'sqlite'
+
+
+class SearchResults:
+    """
+    Ленивый список постов, найденных по тексту поста и комментариев,
+    в порядке релевантности (bm25). Подходит для Paginator.
+    """
+
+    def __init__(self, text):
+        self.match = match_query(text)
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(COUNT_SQL, [self.match, self.match])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not self.match:
+            return []
+        start = key.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(SEARCH_SQL, [
+                self.match, COMMENT_WEIGHT, self.match,
+                key.stop - start, start
+            ])
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(text):
+    if has_index():
+        return SearchResults(text)
+    return Post.objects.select_related('author', 'group').filter(
+        Q(text__icontains=text) | Q(comments__text__icontains=text)
+    ).distinct()
+
+
+def filter_posts(queryset, text):
+    """Отбирает посты с совпадением в тексте; используется в админке."""
+    if not has_index():
+        return queryset.filter(text__icontains=text)
+    # RawSQL в pk__in дал бы IN ((...)): SQLite берет из него одно значение.
+    return queryset.extra(
+        where=[f'"posts_post"."id" IN ({POST_IDS_SQL})'],
+        params=[match_query(text)],
+    )
+
+
+def restore_triggers(using=DEFAULT_DB_ALIAS):
+    """
+    Создает пропавшие триггеры поиска: SQLite теряет их, когда миграция
+    пересоздает таблицу. Записи без триггеров в индекс не попадали,
+    поэтому он перестраивается целиком. Возвращает число триггеров.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return 0
+    with transaction.atomic(using), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if 'posts_post_fts' not in existing:
+            # Индекс еще не создан или миграции откачены.
+            return 0
+        missing = [
+            sql for name, sql in TRIGGERS.items() if name not in existing
+        ]
+        if not missing:
+            return 0
+        for sql in missing:
+            cursor.execute(sql)
+        for table in ('post', 'comment'):
+            cursor.execute(
+                f'INSERT INTO posts_{table}_fts(posts_{table}_fts) '
+                f"VALUES ('delete-all')"
+            )
+        for sql in REINDEX:
+            cursor.execute(sql)
+    return len(missing)
+
+
+def index_since(post_pk, comment_pk):
+    """
+    Добавляет в поисковый индекс посты и комментарии с id больше
+    указанных: нужно после вставки в обход триггеров.
+    """
+    if not has_index():
+        return
+    with connection.cursor() as cursor:
+        for table, pk in (('post', post_pk), ('comment', comment_pk)):
+            cursor.execute(
+                f'INSERT INTO posts_{table}_fts(rowid, text) '
+                f"SELECT id, replace(replace(text, 'ё', 'е'), 'Ё', 'Е') "
+                f'FROM posts_{table} WHERE id > %s',
+                [pk]
+            )
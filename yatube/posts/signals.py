@@ -0,0 +1,140 @@
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (counters, hits, images, listings, search, thumbnails,
+               timeline)
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Поля, которые карточки постов показывают из автора и группы.
+CARD_FIELDS = {
+    User: ('username', 'first_name', 'last_name'),
+    Group: ('title', 'slug'),
+}
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Group)
+def card_source_changing(sender, instance, raw=False, update_fields=None,
+                         **kwargs):
+    fields = CARD_FIELDS[sender]
+    instance._previous_card = None
+    if raw or not instance.pk:
+        return
+    if update_fields is not None and not set(update_fields) & set(fields):
+        # Например, вход пользователя обновляет только last_login.
+        return
+    instance._previous_card = sender.objects.filter(
+        pk=instance.pk
+    ).values_list(*fields).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+def card_source_saved(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_card', None)
+    current = tuple(getattr(instance, field) for field in CARD_FIELDS[sender])
+    if previous is None or previous == current:
+        return
+    if sender is User:
+        listings.cards_changed(Post.objects.filter(author=instance))
+    else:
+        listings.cards_changed(Post.objects.filter(group=instance))
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    instance._previous = (None, None, None)
+    if instance.pk and not raw:
+        instance._previous = Post.objects.filter(
+            pk=instance.pk
+        ).values_list(
+            'group_id', 'author_id', 'image'
+        ).first() or (None, None, None)
+    if not raw and instance.image.name != instance._previous[2]:
+        # Новой картинке миниатюру построит пул после коммита.
+        instance.thumbnail = ''
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_group_id, previous_author_id, previous_image = getattr(
+        instance, '_previous', (None, None, None)
+    )
+    for listing in listings.listings_for(instance, previous_group_id):
+        listings.bump_generation(listing)
+    if previous_author_id not in (None, instance.author_id):
+        listings.bump_generation(f'author:{previous_author_id}')
+        counters.post_moved(instance, previous_author_id)
+        timeline.post_moved(instance)
+    listings.forget_post(instance.pk)
+    webp = instance.__dict__.pop('_webp', None)
+    if instance.image and instance.image.name != previous_image:
+        name = instance.image.name
+        if webp:
+            images.save_webp(name, webp)
+        transaction.on_commit(lambda: thumbnails.schedule(name))
+    if created:
+        counters.post_added(instance)
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    for listing in listings.listings_for(instance):
+        listings.bump_generation(listing)
+    listings.forget_post(instance.pk)
+    counters.post_removed(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.comment_added(instance)
+        listings.forget_post(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.comment_removed(instance)
+    listings.forget_post(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.follow_added(instance)
+        timeline.on_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.follow_removed(instance)
+    timeline.on_unfollow(instance)
+
+
+@receiver(post_migrate)
+def search_triggers_checked(sender, using, **kwargs):
+    # Страховка для миграций, пересоздающих таблицы постов и комментариев.
+    if sender.name == 'posts':
+        search.restore_triggers(using)
+
+
+# Просмотры и миниатюры без пула пишутся после отдачи ответа.
+request_finished.connect(hits.flush_if_due, dispatch_uid='posts.hits')
+request_started.connect(
+    thumbnails.request_started, dispatch_uid='posts.thumbnails'
+)
+request_finished.connect(
+    thumbnails.request_finished, dispatch_uid='posts.thumbnails'
+)
@@ -0,0 +1,199 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.db.models import QuerySet
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Comment, Follow, Group, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class NormalizeImagesTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        buffer = BytesIO()
+        Image.new('RGB', (50, 50), 'red').save(buffer, 'BMP')
+        self.name = default_storage.save(
+            'posts/normalize.bmp', ContentFile(buffer.getvalue()))
+        author = User.objects.create_user(username='normalizer')
+        self.posts = [
+            Post.objects.create(text=f'Пост {i}', author=author,
+                                image=self.name)
+            for i in range(2)
+        ]
+
+    def tearDown(self):
+        for name in (self.name, 'posts/normalize.jpg', 'posts/normalize.webp'):
+            default_storage.delete(name)
+
+    def test_posts_move_to_new_file(self):
+        """Все посты с картинкой переходят на новый файл, старый удален."""
+        call_command('normalize_images', stdout=StringIO())
+        names = {post.image.name for post in Post.objects.all()}
+        self.assertEqual(names, {'posts/normalize.jpg'})
+        self.assertTrue(default_storage.exists('posts/normalize.jpg'))
+        self.assertFalse(default_storage.exists(self.name))
+
+    def test_failed_update_keeps_old_file(self):
+        """Сбой при записи в базу не оставляет посты без картинки."""
+        with mock.patch.object(QuerySet, 'update', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                call_command('normalize_images', stdout=StringIO())
+        post = Post.objects.get(pk=self.posts[0].pk)
+        self.assertEqual(post.image.name, self.name)
+        self.assertTrue(default_storage.exists(self.name))
+        self.assertFalse(default_storage.exists('posts/normalize.jpg'))
+
+
+class ImportCommandTest(TestCase):
+    RECORDS = [
+        {'type': 'group', 'slug': 'imported', 'title': 'Импорт'},
+        {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+        {'type': 'post', 'id': 'a', 'author': 'writer', 'group': 'imported',
+         'text': 'Первый пост', 'pub_date': '2020-01-01T10:00:00'},
+        {'type': 'comment', 'post': 'a', 'author': 'reader',
+         'text': 'Комментарий'},
+        {'type': 'post', 'id': 'b', 'author': 'writer',
+         'text': 'Второй пост', 'pub_date': '2020-01-02T10:00:00'},
+        {'type': 'comment', 'post': 'a', 'author': 'writer',
+         'text': 'Ответ'},
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'import.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, records):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def run_import(self, **options):
+        call_command(
+            'import_content', self.path, chunk_size=2, stdout=StringIO(),
+            **options
+        )
+
+    def assert_imported(self):
+        writer = User.objects.get(username='writer')
+        reader = User.objects.get(username='reader')
+        first = Post.objects.get(text='Первый пост')
+        self.assertEqual(first.pub_date.year, 2020)
+        self.assertEqual(first.group.slug, 'imported')
+        self.assertEqual(first.comments.count(), 2)
+        self.assertEqual(first.comments_count, 2)
+        self.assertEqual(writer.stats.posts_count, 2)
+        self.assertEqual(writer.stats.followers_count, 1)
+        self.assertEqual(reader.timeline.count(), 2)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+
+    def test_import(self):
+        """Импорт создает записи, счетчики и ленты с датами из файла."""
+        self.write(self.RECORDS)
+        self.run_import()
+        self.assert_imported()
+
+    def test_resume(self):
+        """После сбоя импорт продолжается с контрольной точки."""
+        broken = [dict(record) for record in self.RECORDS]
+        broken[4]['group'] = 'missing'
+        self.write(broken)
+        with self.assertRaises(CommandError):
+            self.run_import()
+        self.assertEqual(Post.objects.count(), 1)
+        with self.assertRaises(CommandError):
+            self.run_import()
+        self.write(self.RECORDS)
+        self.run_import(resume=True)
+        self.assert_imported()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='exporter')
+        cls.group = Group.objects.create(
+            title='Группа', slug='export', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост, с запятой', group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Комментарий'
+        )
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader'),
+            author=cls.author
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_export_command(self):
+        """Выгрузка в JSONL.gz и CSV содержит все типы записей."""
+        path = os.path.join(self.directory, 'export.jsonl.gz')
+        call_command('export_content', path, stdout=StringIO())
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['group', 'post', 'comment', 'follow']
+        )
+        self.assertEqual(records[1]['id'], self.post.pk)
+        self.assertEqual(records[2]['post'], self.post.pk)
+        path = os.path.join(self.directory, 'export.csv')
+        call_command(
+            'export_content', path, types='post', stdout=StringIO()
+        )
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['text'], 'Пост, с запятой')
+        self.assertEqual(rows[0]['group'], 'export')
+
+    def test_admin_download(self):
+        """Админка отдает выгрузку потоком."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_export'), {'format': 'jsonl'}
+        )
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        client.force_login(self.author)
+        response = client.get(reverse('admin:posts_post_export'))
+        self.assertEqual(response.status_code, 302)
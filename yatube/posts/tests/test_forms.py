@@ -1,20 +1,30 @@
+import os
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import OperationalError
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
+from PIL import Image
 
+from .. import images, thumbnails
+from ..constants import image_max_side
 from ..models import Comment, Group, Post
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+# Миниатюры строятся сразу, а не в пуле, который пережил бы
+# временный MEDIA_ROOT.
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -69,10 +79,30 @@ class PostCreateFormTests(TestCase):
             'group': self.group.id,
             'image': uploaded,
         }
-        response = self.authorized_client.post(reverse('posts:post_create'),
-                                               data=form_data,
-                                               follow=True)
+        # TestCase не коммитит, поэтому on_commit выполняется сразу.
+        with mock.patch(
+            'posts.signals.transaction.on_commit', lambda func: func()
+        ), mock.patch.object(
+            thumbnails, 'generate', wraps=thumbnails.generate
+        ) as generate:
+            response = self.authorized_client.post(
+                reverse('posts:post_create'), data=form_data
+            )
         post = Post.objects.latest('id')
+        generate.assert_called_once_with(post.image.name)
+        generated = [
+            name for _, _, names in os.walk(
+                os.path.join(TEMP_MEDIA_ROOT, 'cache')
+            ) for name in names
+        ]
+        self.assertEqual(len(generated), len(thumbnails.GEOMETRIES))
+        post.refresh_from_db()
+        self.assertIn(post.thumbnail, (
+            os.path.relpath(os.path.join(folder, name), TEMP_MEDIA_ROOT)
+            for folder, _, names in os.walk(
+                os.path.join(TEMP_MEDIA_ROOT, 'cache')
+            ) for name in names
+        ))
         self.assertEqual(Post.objects.count(), post_count + 1)
         self.assertEqual(post.text, 'Тестовый текст')
         self.assertEqual(post.author, self.user)
@@ -134,3 +164,117 @@ class PostCreateFormTests(TestCase):
                 group=self.group,
             ).exists()
         )
+
+
+class ImageNormalizationTest(TestCase):
+    def make_image(self, image_format, size, **options):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, image_format, **options)
+        return buffer.getvalue()
+
+    def test_large_photo_is_shrunk_and_stripped(self):
+        """Большое фото уменьшается, EXIF выбрасывается."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        data = self.make_image(
+            'JPEG', (image_max_side * 2, 100), exif=exif, quality=100
+        )
+        result = images.normalize(data)
+        image = Image.open(BytesIO(result.data))
+        self.assertEqual(image.size, (image_max_side, 50))
+        self.assertNotIn('exif', image.info)
+        self.assertIsNone(result.extension)
+        self.assertGreater(result.saved, 0)
+
+    def test_upload_without_orientation_keeps_bytes(self):
+        """Сжатое фото без поворота и метаданных не перекодируется."""
+        buffer = BytesIO()
+        Image.effect_noise((64, 64), 60).convert('RGB').save(
+            buffer, 'JPEG', quality=30, optimize=True, progressive=True
+        )
+        data = buffer.getvalue()
+        result = images.normalize(data)
+        self.assertEqual(result.data, data)
+        self.assertEqual(result.saved, 0)
+
+    def test_orientation_is_applied(self):
+        """Тег Orientation поворачивает картинку."""
+        exif = Image.Exif()
+        exif[images.ORIENTATION] = 6
+        data = self.make_image('JPEG', (80, 40), exif=exif)
+        image = Image.open(BytesIO(images.normalize(data).data))
+        self.assertEqual(image.size, (40, 80))
+
+    def test_bmp_upload_converted_to_jpeg(self):
+        """Форма сохраняет BMP как JPEG."""
+        user = User.objects.create_user(username='bmp')
+        client = Client()
+        client.force_login(user)
+        uploaded = SimpleUploadedFile(
+            'photo.bmp', self.make_image('BMP', (50, 50)), 'image/bmp'
+        )
+        with override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT):
+            client.post(reverse('posts:post_create'), data={
+                'text': 'Текст', 'image': uploaded
+            })
+        post = Post.objects.get(author=user)
+        self.assertEqual(post.image.name, 'posts/photo.jpg')
+
+
+@override_settings(THUMBNAIL_WORKERS=0, SQLITE_WRITE_BACKOFF=0)
+class LockedWriteTest(TransactionTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create_user(username='locked')
+        self.client.force_login(self.user)
+
+    def create_post(self, locked_attempts):
+        """Создает пост, вставка которого упирается в блокировку."""
+        original = Post._do_insert
+        calls = []
+
+        # Файл уже записан при вставке, затем транзакция откатывается.
+        def locked(post, *args, **kwargs):
+            result = original(post, *args, **kwargs)
+            calls.append(post)
+            if len(calls) <= locked_attempts:
+                raise OperationalError('database is locked')
+            return result
+
+        buffer = BytesIO()
+        Image.new('RGB', (50, 50), 'red').save(buffer, 'PNG')
+        uploaded = SimpleUploadedFile(
+            'locked.png', buffer.getvalue(), 'image/png'
+        )
+        with mock.patch.object(Post, '_do_insert', locked):
+            self.client.post(reverse('posts:post_create'), data={
+                'text': 'Текст', 'image': uploaded
+            })
+        return calls
+
+    def stored_images(self):
+        folder = os.path.join(self.media_root, 'posts')
+        return [
+            name for name in os.listdir(folder)
+            if not name.endswith('.webp')
+        ]
+
+    def test_retry_does_not_duplicate_image(self):
+        """Повтор записи после блокировки не оставляет лишних файлов."""
+        self.assertEqual(len(self.create_post(locked_attempts=1)), 2)
+        post = Post.objects.get(author=self.user)
+        self.assertEqual(
+            self.stored_images(), [os.path.basename(post.image.name)]
+        )
+
+    @override_settings(SQLITE_WRITE_ATTEMPTS=2)
+    def test_failed_write_removes_image(self):
+        """Если запись так и не удалась, файл картинки удаляется."""
+        with self.assertRaises(OperationalError):
+            self.create_post(locked_attempts=2)
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(self.stored_images(), [])
@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
 
-from ..models import Group, Post
+from .. import hits
+from ..models import Comment, Follow, Group, Post, PostStats, UserStats
 
 User = get_user_model()
 
@@ -31,3 +36,126 @@ class PostModelTest(TestCase):
         for value, expected in objects.items():
             with self.subTest(value=value):
                 self.assertEqual(value, expected)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='counted_author')
+        cls.reader = User.objects.create_user(username='counted_reader')
+
+    def test_post_and_comment_counters(self):
+        """Счетчики постов и комментариев следуют за созданием и удалением."""
+        post = Post.objects.create(text='Посчитанный пост', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        self.author.stats.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        post.delete()
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка меняет счетчики подписчиков и подписок."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0)
+
+    def test_recount_command(self):
+        """Команда пересчета исправляет разошедшиеся счетчики."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        call_command('recount_counters', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        self.assertEqual(post.comments_count, 0)
+
+
+class UserDeletionTest(TransactionTestCase):
+    def test_delete_user_with_content(self):
+        """Каскадное удаление пользователя не воскрешает его счетчики."""
+        author = User.objects.create_user(username='deleted_author')
+        reader = User.objects.create_user(username='deleted_reader')
+        post = Post.objects.create(text='Пост удаляемого', author=author)
+        Comment.objects.create(post=post, author=author, text='Свой')
+        Comment.objects.create(post=post, author=reader, text='Чужой')
+        Follow.objects.create(user=author, author=reader)
+        Follow.objects.create(user=reader, author=author)
+        author.delete()
+        self.assertFalse(UserStats.objects.filter(user_id=author.pk).exists())
+        stats = UserStats.objects.get(user=reader)
+        self.assertEqual(
+            (stats.followers_count, stats.following_count), (0, 0))
+
+    def test_missing_stats_created_on_read(self):
+        """Строка счетчиков, которой нет, появляется при чтении профиля."""
+        author = User.objects.create_user(username='statless_author')
+        Post.objects.create(text='Пост', author=author)
+        UserStats.objects.filter(user=author).delete()
+        response = self.client.get(
+            reverse('posts:profile', args=(author.username,)))
+        self.assertEqual(response.context['author'].stats.posts_count, 1)
+
+
+@override_settings(
+    VIEW_COUNTER_FLUSH_SIZE=1000, VIEW_COUNTER_FLUSH_INTERVAL=1000
+)
+class ViewCounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='viewed_author')
+        cls.post = Post.objects.create(text='Читаемый пост', author=cls.author)
+        cls.url = reverse('posts:post_detail', args=(cls.post.pk,))
+
+    def setUp(self):
+        # Просмотры, накопленные другими тестами.
+        hits.flush()
+
+    def test_views_buffered_then_flushed(self):
+        """Просмотры копятся в памяти и пишутся в базу одной пачкой."""
+        for _ in range(3):
+            self.client.get(self.url)
+        self.assertFalse(PostStats.objects.exists())
+        self.assertEqual(hits.pending()[self.post.pk], 3)
+        self.assertEqual(hits.flush(), 3)
+        self.assertEqual(
+            PostStats.objects.get(post=self.post).views_count, 3)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).views_count, 3)
+        self.assertContains(self.client.get(self.url), 'Просмотров: 3')
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+        self.assertContains(response, 'Просмотров постов: 3')
+
+    def test_flush_on_threshold(self):
+        """Достигнув порога, просмотры пишутся после отдачи ответа."""
+        with self.settings(VIEW_COUNTER_FLUSH_SIZE=2):
+            self.client.get(self.url)
+            self.assertFalse(PostStats.objects.exists())
+            self.client.get(self.url)
+        self.assertEqual(
+            PostStats.objects.get(post=self.post).views_count, 2)
+        self.assertEqual(hits.pending(), {})
+
+    def test_deleted_post_views_dropped(self):
+        post = Post.objects.create(text='Удаленный пост', author=self.author)
+        hits.record(post)
+        hits.record(self.post)
+        post.delete()
+        self.assertEqual(hits.flush(), 1)
+        self.assertEqual(PostStats.objects.count(), 1)
@@ -0,0 +1,157 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Comment, Follow, Group, Post, UserStats
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class QueryBudgetTest(TestCase):
+    """Страницы укладываются в объявленный бюджет запросов и без N+1."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(username=f'budget_author_{i}')
+            for i in range(4)
+        ]
+        cls.reader = User.objects.create_user(username='budget_reader')
+        cls.group = Group.objects.create(title='Группа', slug='budget_group')
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for i in range(12):
+            cls.post = Post.objects.create(
+                text=f'Пост {i}',
+                author=cls.authors[i % 4],
+                group=cls.group if i % 2 else None,
+                image=SimpleUploadedFile(f'budget_{i}.gif', SMALL_GIF),
+            )
+            # То, что пул делает после коммита, которого в TestCase нет.
+            thumbnails.generate(cls.post.image.name)
+        for author in cls.authors:
+            Comment.objects.create(
+                post=cls.post, author=author, text='Комментарий')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def assert_within_budget(self, client, url):
+        response = client.get(url)
+        stats = response.wsgi_request.query_stats
+        budget = response.wsgi_request.resolver_match.func.query_budget
+        self.assertLessEqual(stats.count, budget, url)
+        self.assertEqual(stats.repeated, {}, url)
+
+    def test_pages_fit_budgets(self):
+        """Число запросов не растет вместе с числом постов на странице."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.authors[0].username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:post_comments', args=[self.post.pk]),
+            reverse('posts:search') + '?q=Пост',
+        )
+        for url in urls:
+            for client in (self.client, self.authorized_client):
+                with self.subTest(url=url, client=client):
+                    self.assert_within_budget(client, url)
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+        ):
+            with self.subTest(url=url):
+                self.assert_within_budget(self.authorized_client, url)
+        author_client = Client()
+        author_client.force_login(self.post.author)
+        self.assert_within_budget(
+            author_client, reverse('posts:post_edit', args=[self.post.pk]))
+
+    def test_follow_index_with_pull_authors(self):
+        """Посты "тяжелых" авторов читаются одним запросом на всех."""
+        UserStats.objects.update(timeline_pull=True)
+        self.assert_within_budget(
+            self.authorized_client, reverse('posts:follow_index'))
+
+    def test_profile_without_stats_fits_budget(self):
+        """Недостающая строка счетчиков восстанавливается в бюджете."""
+        UserStats.objects.filter(user=self.authors[0]).delete()
+        self.assert_within_budget(
+            self.authorized_client,
+            reverse('posts:profile', args=[self.authors[0].username]))
+        self.assertEqual(
+            UserStats.objects.get(user=self.authors[0]).posts_count, 3)
+
+    @mock.patch('django.db.transaction.on_commit', lambda func: func())
+    def test_post_with_image_fits_budget(self):
+        """Миниатюры без пула строятся после ответа, вне бюджета."""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            {
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile('budget_new.gif', SMALL_GIF),
+            },
+        )
+        request = response.wsgi_request
+        self.assertLessEqual(
+            request.query_stats.count,
+            request.resolver_match.func.query_budget)
+        self.assertTrue(
+            Post.objects.get(text='Пост с картинкой').thumbnail)
+
+    def test_writes_fit_budgets(self):
+        """Запись поста, комментария и подписки укладывается в бюджет."""
+        author = self.authors[0].username
+        author_client = Client()
+        author_client.force_login(self.post.author)
+        requests = (
+            (self.authorized_client, reverse('posts:post_create'),
+             {'text': 'Новый пост'}),
+            (author_client, reverse('posts:post_edit', args=[self.post.pk]),
+             {'text': 'Исправленный пост'}),
+            (self.authorized_client,
+             reverse('posts:add_comment', args=[self.post.pk]),
+             {'text': 'Новый комментарий'}),
+            (self.authorized_client,
+             reverse('posts:profile_unfollow', args=[author]), None),
+            (self.authorized_client,
+             reverse('posts:profile_follow', args=[author]), None),
+        )
+        for client, url, data in requests:
+            with self.subTest(url=url):
+                if data is None:
+                    response = client.get(url)
+                else:
+                    response = client.post(url, data)
+                request = response.wsgi_request
+                self.assertLessEqual(
+                    request.query_stats.count,
+                    request.resolver_match.func.query_budget, url)
+                self.assertEqual(request.query_stats.repeated, {}, url)
@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+# Таблицы, по которым ленты не имеют права читать всю таблицу целиком.
+CHECKED_TABLES = (
+    'posts_post',
+    'posts_comment',
+    'posts_follow',
+    'posts_timelineentry',
+    'posts_userstats',
+)
+
+
+class QueryPlanTest(TestCase):
+    """Планы запросов всех страниц не содержат полных проходов и сортировок."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=f'plan_user_{i}')
+            for i in range(5)
+        ]
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'plan_group_{i}')
+            for i in range(3)
+        ]
+        for user in cls.users[1:]:
+            Follow.objects.create(user=cls.users[0], author=user)
+        for i in range(60):
+            post = Post.objects.create(
+                text=f'Пост для плана {i}',
+                author=cls.users[i % 5],
+                group=cls.groups[i % 3] if i % 2 else None,
+            )
+            Comment.objects.create(
+                post=post, author=cls.users[(i + 1) % 5], text='Комментарий')
+        cls.post = post
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.users[0])
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def bad_steps(self, url):
+        """
+        Шаги плана, читающие таблицу лент целиком или с сортировкой.
+
+        Страница по курсору обязана искать по индексу (SEARCH). Прочим
+        запросам SCAN разрешен только как обход индекса в нужном порядке
+        с LIMIT: такой обход останавливается на границе страницы.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        steps = []
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            bounded = 'LIMIT' in sql and 'cursor=' not in url
+            for step in self.explain(sql):
+                if not any(table in step for table in CHECKED_TABLES):
+                    if 'TEMP B-TREE' not in step:
+                        continue
+                ordered_walk = bounded and 'USING' in step and 'INDEX' in step
+                if 'TEMP B-TREE' in step or (
+                    step.startswith('SCAN') and not ordered_walk
+                ):
+                    steps.append((step, sql))
+        return steps
+
+    def test_views_use_indexes(self):
+        """Страницы читают ленты по индексам, без TEMP B-TREE."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.groups[1].slug]),
+            reverse('posts:profile', args=[self.users[2].username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.bad_steps(url), [])
+
+    def test_cursor_pages_use_indexes(self):
+        """Следующие страницы по курсору тоже читаются по индексу."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.groups[1].slug]),
+            reverse('posts:profile', args=[self.users[2].username]),
+            reverse('posts:follow_index'),
+        ):
+            response = self.client.get(url)
+            cursor = response.context['page_obj'].paginator.next_cursor
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.bad_steps(f'{url}?cursor={cursor}'), [])
+
+    def test_numbered_pages_use_indexes(self):
+        """Страницы ?page=N считают и читают строки по индексу."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.groups[1].slug]),
+            reverse('posts:profile', args=[self.users[2].username]),
+            reverse('posts:follow_index'),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.bad_steps(f'{url}?page=2'), [])
+
+    def test_pull_timeline_uses_indexes(self):
+        """Лента с "тяжелыми" авторами читает каждую часть по индексу."""
+        UserStats.objects.filter(user__in=self.users[1:3]).update(
+            timeline_pull=True)
+        url = reverse('posts:follow_index')
+        response = self.client.get(url)
+        cursor = response.context['page_obj'].paginator.next_cursor
+        for page in ('', f'?cursor={cursor}', '?page=2'):
+            cache.clear()
+            with self.subTest(page=page):
+                self.assertEqual(self.bad_steps(url + page), [])
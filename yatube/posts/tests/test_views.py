@@ -1,11 +1,22 @@
+import json
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.test import Client, RequestFactory, TestCase
 from django.urls import reverse
 from django import forms
 from django.core.cache import cache
+from django.db import connection
 
-from posts.models import Post, Group, Follow
-from posts.constants import limitation
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                          UserStats)
+from posts import search
+from posts.constants import comments_limit, limitation
+from posts.listings import forget_post, get_listing_page
+from posts.utils import CursorPaginator, WindowedPaginator
 
 
 User = get_user_model()
@@ -43,6 +54,7 @@ class PostTests(TestCase):
                 description='test_group_2_description'))
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -121,16 +133,53 @@ class PostTests(TestCase):
         self.assertEqual(response.context['post'], self.post)
 
     def test_cache_index(self):
-        response = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.create(
+        """
+        Карточки постов кэшируются по версии поста: новый пост сразу
+        виден в ленте, а правка сбрасывает только карточку этого поста.
+        """
+        first, second = Post.objects.order_by('pk')[:2]
+        self.authorized_client.get(reverse('posts:index'))
+        new_post = Post.objects.create(
             text='Проверка кэша',
             author=PostTests.author,
         )
         response = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotContains(response, 'Проверка кэша')
-        cache.clear()
-        response = self.authorized_client.get(reverse('posts:index'))
         self.assertContains(response, 'Проверка кэша')
+        # Обновление в обход save() не меняет версию: карточки прежние.
+        Post.objects.filter(pk__in=(first.pk, second.pk)).update(
+            text='Изменено без сохранения'
+        )
+        for pk in (first.pk, second.pk, new_post.pk):
+            forget_post(pk)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Изменено без сохранения')
+        first.text = 'Отредактированный пост'
+        first.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Отредактированный пост')
+        self.assertContains(response, second.text)
+        self.assertNotContains(response, 'Изменено без сохранения')
+
+    def test_post_card_shared_by_listings(self):
+        """Все четыре ленты показывают одну и ту же карточку поста."""
+        Follow.objects.create(user=self.user, author=self.post.author)
+        cards = {}
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.post.group.slug,)),
+            reverse('posts:profile', args=(self.post.author.username,)),
+            reverse('posts:follow_index'),
+        ):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertTemplateUsed(
+                    response, 'posts/includes/post_card.html'
+                )
+                content = response.content.decode()
+                start = content.index('<article class="py-4">')
+                end = content.index('</article>', start)
+                cards[url] = content[start:end]
+        self.assertEqual(len(set(cards.values())), 1)
 
     def test_login_user_follow(self):
         """
@@ -195,6 +244,7 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(cls.posts)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.create_user(username='leo')
         self.authorized_client = Client()
@@ -227,3 +277,573 @@ class PaginatorViewsTest(TestCase):
             response = self.client.get(tested_url)
             self.assertEqual(
                 len(response.context.get('page_obj').object_list), 3)
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='cursor_author')
+        Post.objects.bulk_create(
+            Post(text=f'Пост для курсора {i}', author=cls.author)
+            for i in range(limitation + 3)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_navigation(self):
+        """Курсоры ведут на следующую и обратно на первую страницу."""
+        response = self.client.get(reverse('posts:index'))
+        first_page = response.context['page_obj']
+        self.assertEqual(len(first_page), limitation)
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+
+        next_cursor = first_page.paginator.next_cursor
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': next_cursor})
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+
+        response = self.client.get(
+            reverse('posts:index'),
+            {'cursor': second_page.paginator.previous_cursor})
+        self.assertEqual(
+            list(response.context['page_obj']), list(first_page))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор отдает первую страницу."""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'не-курсор'})
+        self.assertEqual(len(response.context['page_obj']), limitation)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_cursor_page_is_single_query(self):
+        """Страница по курсору читается одним запросом без COUNT."""
+        first_page = CursorPaginator(Post.objects.all(), limitation)
+        first_page.cursor_page(None)
+        paginator = CursorPaginator(Post.objects.all(), limitation)
+        with self.assertNumQueries(1):
+            page = paginator.cursor_page(first_page.next_cursor)
+            self.assertFalse(page.has_next())
+
+
+class WindowedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='window_author')
+        Post.objects.bulk_create(
+            Post(text=f'Пост для окна {i}', author=cls.author)
+            for i in range(13)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_window_around_current_page(self):
+        """Навигация показывает окно вокруг страницы, а не все номера."""
+        paginator = WindowedPaginator(Post.objects.all(), 1)
+        self.assertEqual(
+            paginator.page(7).window, [1, None, 5, 6, 7, 8, 9, None, 13])
+        self.assertEqual(paginator.page(1).window, [1, 2, 3, None, 13])
+        self.assertEqual(paginator.page(12).window, [1, None, 10, 11, 12, 13])
+
+    def test_huge_listing_count_is_estimate(self):
+        """За count_limit строки не считаются, последняя не известна."""
+        paginator = WindowedPaginator(Post.objects.all(), 1)
+        paginator.count_limit = 5
+        self.assertEqual(paginator.count, 5)
+        self.assertTrue(paginator.count_is_estimate)
+        self.assertEqual(
+            paginator.page(5).window, [1, None, 3, 4, 5, 6, None])
+        self.assertEqual(paginator.page(3).window, [1, 2, 3, 4, 5, None])
+
+    def test_pages_past_estimate(self):
+        """Страницы за границей подсчета читаются, пустая дает 404."""
+        with mock.patch.object(WindowedPaginator, 'count_limit', 5):
+            response = self.client.get(reverse('posts:index'), {'page': 1})
+            self.assertTrue(response.context['page_obj'].has_next())
+            response = self.client.get(reverse('posts:index'), {'page': 2})
+            page = response.context['page_obj']
+            self.assertEqual(page.number, 2)
+            self.assertEqual(len(page), 3)
+            self.assertFalse(page.has_next())
+            self.assertEqual(page.window, [1, 2])
+            response = self.client.get(reverse('posts:index'), {'page': 3})
+            self.assertEqual(response.status_code, 404)
+
+    def test_count_is_cached_by_key(self):
+        """С count_key повторный подсчет берется из кэша."""
+        WindowedPaginator(Post.objects.all(), 1, count_key='count').count
+        paginator = WindowedPaginator(Post.objects.all(), 1, count_key='count')
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 13)
+
+    def test_new_post_updates_cached_count(self):
+        """Запись в ленту сбрасывает закэшированное число постов."""
+        url = reverse('posts:index') + '?page=1'
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+        Post.objects.create(text='Еще один пост', author=self.author)
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 14)
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(author=author, text='Популярный пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=author, text=f'Комментарий №{i}.'
+            )
+            for i in range(comments_limit + 5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_shows_first_page(self):
+        """На странице поста только первая страница комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), comments_limit)
+        self.assertEqual(comments[0], self.comments[-1])
+        self.assertTrue(comments.has_next)
+        self.assertContains(
+            response, reverse('posts:post_comments', args=(self.post.pk,))
+        )
+
+    def test_load_more_fragment(self):
+        """Фрагмент по курсору отдает оставшиеся комментарии без base.html."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        cursor = response.context['comments'].paginator.next_cursor
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            {'cursor': cursor}
+        )
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            list(response.context['comments']), self.comments[4::-1]
+        )
+        self.assertNotContains(response, 'Показать еще')
+        self.assertNotContains(
+            response, f'Комментарий №{comments_limit}.'
+        )
+
+    def test_fragment_for_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk + 1,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='timeline_author')
+        cls.reader = User.objects.create_user(username='timeline_reader')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def get_feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту, отписка очищает ее."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.get_feed(), [self.old_post])
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.get_feed(), [])
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в материализованную ленту подписчика."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.get_feed(), [post, self.old_post])
+
+    def test_author_change_moves_timeline_entries(self):
+        """Пост, переданный другому автору, уходит в ленты его подписчиков."""
+        other = User.objects.create_user(username='timeline_other')
+        Follow.objects.create(user=other, author=self.author)
+        Follow.objects.create(user=self.reader, author=other)
+        post = Post.objects.create(text='Чужой пост', author=self.author)
+        post.author = other
+        post.save()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=other, post=post).exists())
+        self.assertEqual(self.get_feed(), [post])
+
+    @mock.patch('posts.timeline.fanout_limit', 1)
+    def test_pull_author_is_read_directly(self):
+        """Посты авторов с огромным числом подписчиков читаются напрямую."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(
+            text='Пост без раскладки', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.get_feed(), [post, self.old_post])
+
+    @mock.patch('posts.timeline.fanout_limit', 2)
+    def test_pull_author_pages_merge(self):
+        """Страницы ленты с "тяжелым" автором идут без пропусков."""
+        regular = User.objects.create_user(username='timeline_regular')
+        other = User.objects.create_user(username='timeline_other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        Follow.objects.create(user=self.reader, author=regular)
+        for i in range(12):
+            Post.objects.create(
+                text=f'Пост {i}', author=(self.author, regular)[i % 2])
+        expected = list(Post.objects.filter(
+            author__in=(self.author, regular)).order_by('-pub_date', '-id'))
+        url = reverse('posts:follow_index')
+        feed, cursor = [], ''
+        while cursor is not None:
+            response = self.authorized_client.get(f'{url}?cursor={cursor}')
+            feed += response.context['page_obj']
+            cursor = response.context['page_obj'].paginator.next_cursor
+        self.assertEqual(feed, expected)
+        response = self.authorized_client.get(f'{url}?page=2')
+        self.assertEqual(list(response.context['page_obj']), expected[10:])
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+
+    @mock.patch('posts.timeline.fanout_limit', 3)
+    @mock.patch('posts.timeline.fanout_resume_limit', 2)
+    def test_unfollow_resumes_fan_out_later(self):
+        """Отписка не заполняет ленты, это делает resume_fanout."""
+        readers = [self.reader] + [
+            User.objects.create_user(username=f'timeline_reader_{i}')
+            for i in range(2)
+        ]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.author)
+        stats = UserStats.objects.filter(user=self.author)
+        self.assertTrue(stats.get().timeline_pull)
+        post = Post.objects.create(
+            text='Пост без раскладки', author=self.author)
+        entry = TimelineEntry.objects.filter(user=self.reader, post=post)
+        Follow.objects.filter(user=readers[2]).delete()
+        call_command('resume_fanout', stdout=StringIO())
+        self.assertTrue(stats.get().timeline_pull)
+        Follow.objects.filter(user=readers[1]).delete()
+        self.assertTrue(stats.get().timeline_pull)
+        self.assertFalse(entry.exists())
+        self.assertEqual(self.get_feed(), [post, self.old_post])
+        call_command('resume_fanout', stdout=StringIO())
+        self.assertFalse(stats.get().timeline_pull)
+        self.assertTrue(entry.exists())
+        cache.clear()
+        self.assertEqual(self.get_feed(), [post, self.old_post])
+
+
+class ListingCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='listing_author')
+        cls.group = Group.objects.create(
+            title='Группа для кэша', slug='cache_group')
+        cls.post = Post.objects.create(
+            text='Пост для кэша', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def get_listing(self, posts, listing):
+        request = self.factory.get('/')
+        return list(get_listing_page(posts, request, listing))
+
+    def test_hot_page_skips_database(self):
+        """Повторная выдача страницы не обращается к базе."""
+        self.get_listing(Post.objects.all(), 'index')
+        with self.assertNumQueries(0):
+            page = self.get_listing(Post.objects.all(), 'index')
+            self.assertEqual(page[0].author, self.author)
+
+    def test_post_save_invalidates_listings(self):
+        """Смена группы поста сбрасывает ленты старой и новой групп."""
+        listing = f'group:{self.group.pk}'
+        self.assertEqual(
+            self.get_listing(self.group.posts.all(), listing), [self.post])
+        self.post.group = None
+        self.post.save()
+        self.assertEqual(
+            self.get_listing(self.group.posts.all(), listing), [])
+        self.assertIsNone(
+            self.get_listing(Post.objects.all(), 'index')[0].group)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='search_author')
+        cls.cat_post = Post.objects.create(
+            text='Пушистый кот спит на ёлке', author=cls.author)
+        cls.dog_post = Post.objects.create(
+            text='Собака охраняет дом', author=cls.author)
+        Comment.objects.create(
+            post=cls.dog_post, author=cls.author, text='А у меня коты')
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_by_word_forms(self):
+        """Поиск учитывает формы слов и букву ё."""
+        self.assertEqual(self.search('елка'), [self.cat_post])
+        self.assertEqual(self.search('Собаками'), [self.dog_post])
+
+    def test_search_ranks_posts_above_comments(self):
+        """Совпадение в тексте поста выше совпадения в комментарии."""
+        self.assertEqual(self.search('котами'), [self.cat_post, self.dog_post])
+
+    def test_search_follows_edits(self):
+        """Индекс обновляется при правке поста."""
+        self.cat_post.text = 'Рыжий лис'
+        self.cat_post.save()
+        self.assertEqual(self.search('лис'), [self.cat_post])
+        self.assertEqual(self.search('ёлка'), [])
+
+    def test_empty_query(self):
+        """Пустой запрос ничего не ищет."""
+        self.assertEqual(self.search(''), [])
+        self.assertEqual(self.search('"*'), [])
+
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_triggers_exist_after_migrations(self):
+        """После всех миграций у индекса есть все триггеры."""
+        self.assertLessEqual(set(search.TRIGGERS), self.triggers())
+
+    def test_missing_trigger_restored(self):
+        """Пропавший триггер создается заново, а индекс перестраивается."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_insert')
+        post = Post.objects.create(text='Полосатый енот', author=self.author)
+        self.assertEqual(self.search('енот'), [])
+        self.assertEqual(search.restore_triggers(), 1)
+        self.assertLessEqual(set(search.TRIGGERS), self.triggers())
+        self.assertEqual(self.search('енот'), [post])
+        self.assertEqual(self.search('ёлка'), [self.cat_post])
+        self.assertEqual(search.restore_triggers(), 0)
+
+    def test_migrate_restores_triggers(self):
+        """Триггеры проверяются после каждого migrate."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_comment_fts_update')
+        emit_post_migrate_signal(0, False, 'default')
+        self.assertIn('posts_comment_fts_update', self.triggers())
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет по полнотекстовому индексу."""
+        admin = User.objects.create_superuser(
+            username='search_admin', email='admin@example.com',
+            password='password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собаки'})
+        self.assertEqual(
+            list(response.context['cl'].queryset), [self.dog_post])
+        other = Post.objects.create(text='Две собаки', author=self.author)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собаки'})
+        self.assertEqual(
+            set(response.context['cl'].queryset), {self.dog_post, other})
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='etag_author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='etag', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+
+    def test_unchanged_page_not_rendered(self):
+        """Неизменная страница отдается как 304 без рендеринга шаблона."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertFalse(response.templates)
+
+    def test_last_modified(self):
+        """If-Modified-Since тоже дает 304 для неизменной страницы."""
+        Post.objects.create(author=self.author, text='Еще', group=self.group)
+        for url in self.urls:
+            with self.subTest(url=url):
+                last_modified = self.client.get(url)['Last-Modified']
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_reset_etag(self):
+        """Новый пост и комментарий меняют ETag страниц."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        Post.objects.create(author=self.author, text='Еще', group=self.group)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_author_and_group_changes_reset_etag(self):
+        """Новое имя автора и название группы меняют ETag лент."""
+        urls = self.urls[:3]
+        for change in ('author', 'group'):
+            etags = {url: self.client.get(url)['ETag'] for url in urls}
+            if change == 'author':
+                author = User.objects.get(pk=self.author.pk)
+                author.first_name = 'Новое имя'
+                author.save()
+            else:
+                group = Group.objects.get(pk=self.group.pk)
+                group.title = 'Новое название'
+                group.save()
+            for url, etag in etags.items():
+                with self.subTest(change=change, url=url):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertContains(
+                        response, 'Новое имя' if change == 'author'
+                        else 'Новое название')
+
+    def test_etag_depends_on_user(self):
+        """Страница гостя не подходит авторизованному пользователю."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified_only_for_guests(self):
+        """После входа If-Modified-Since гостя не дает 304."""
+        Post.objects.create(author=self.author, text='Еще', group=self.group)
+        for url in self.urls:
+            with self.subTest(url=url):
+                client = Client()
+                response = client.get(url)
+                self.assertIn('Cookie', response['Vary'])
+                last_modified = response['Last-Modified']
+                client.force_login(self.author)
+                response = client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header('Last-Modified'))
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='feed', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def json_items(self, url):
+        return [
+            item['content_text']
+            for item in json.loads(self.client.get(url).content)['items']
+        ]
+
+    def test_feed_formats(self):
+        """Ленты отдаются в форматах Atom, RSS и JSON Feed."""
+        content_types = {
+            'atom': 'application/atom+xml; charset=utf-8',
+            'rss': 'application/rss+xml; charset=utf-8',
+            'json': 'application/feed+json; charset=utf-8',
+        }
+        for kind, content_type in content_types.items():
+            for url in (
+                reverse('posts:feed', args=[kind]),
+                reverse('posts:group_feed', args=[self.group.slug, kind]),
+                reverse('posts:profile_feed', args=[self.author, kind]),
+            ):
+                with self.subTest(url=url):
+                    response = self.client.get(url)
+                    self.assertEqual(response['Content-Type'], content_type)
+                    self.assertContains(response, 'Пост 2')
+        response = self.client.get(reverse('posts:feed', args=['xml']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_feed(self):
+        """Повторный опрос обходится без базы, а по ETag дает 304."""
+        url = reverse('posts:feed', args=['atom'])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_feed_follows_changes(self):
+        """Правка, удаление и новый пост попадают в ленту."""
+        url = reverse('posts:feed', args=['json'])
+        self.assertEqual(self.json_items(url), ['Пост 2', 'Пост 1', 'Пост 0'])
+        first, second, _ = self.posts
+        first.text = 'Исправленный пост'
+        first.save()
+        second.delete()
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            self.json_items(url),
+            ['Новый пост', 'Пост 2', 'Исправленный пост']
+        )
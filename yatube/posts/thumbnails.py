@@ -0,0 +1,94 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+from sorl.thumbnail import get_thumbnail
+
+from . import listings
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Геометрии и опции должны совпадать с тегами {% thumbnail %} в шаблонах,
+# иначе у sorl получится другой ключ и миниатюра посчитается заново.
+# Первая — миниатюра карточки, ее имя запоминается в Post.thumbnail.
+GEOMETRIES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+_executor = None
+# Картинки, загруженные в текущем запросе потока; None вне запроса.
+_local = threading.local()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def remember(name, thumbnail):
+    """Записывает миниатюру карточки в посты с этой картинкой."""
+    pks = list(Post.objects.filter(image=name).values_list('pk', flat=True))
+    Post.objects.filter(pk__in=pks).update(thumbnail=thumbnail)
+    for pk in pks:
+        listings.forget_post(pk)
+
+
+def generate(name):
+    """Строит все миниатюры одного изображения; возвращает их число."""
+    done = 0
+    for number, (geometry, options) in enumerate(GEOMETRIES):
+        try:
+            thumbnail = get_thumbnail(name, geometry, **options)
+            if number == 0:
+                remember(name, thumbnail.name)
+        except Exception:
+            logger.exception('Не удалось построить миниатюру %s', name)
+        else:
+            done += 1
+    return done
+
+
+def _generate_in_thread(name):
+    close_old_connections()
+    try:
+        return generate(name)
+    finally:
+        connections.close_all()
+
+
+def request_started(**kwargs):
+    _local.pending = []
+
+
+def request_finished(**kwargs):
+    """Строит миниатюры, отложенные до отдачи ответа."""
+    pending = getattr(_local, 'pending', None)
+    _local.pending = None
+    for name in pending or ():
+        generate(name)
+
+
+def schedule(name):
+    """Отдает построение миниатюр пулу потоков, не задерживая запрос."""
+    # SQLite в памяти (тестовая база) блокирует таблицы целиком и не ждет
+    # busy_timeout: поток пула столкнулся бы с запросами основного.
+    in_memory = (
+        connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    )
+    if in_memory or not getattr(settings, 'THUMBNAIL_WORKERS', 2):
+        pending = getattr(_local, 'pending', None)
+        if pending is None:
+            return generate(name)
+        # Без пула миниатюры строятся в этом же потоке, но после
+        # ответа: запросы sorl не входят в запрос пользователя.
+        pending.append(name)
+        return None
+    return get_executor().submit(_generate_in_thread, name)
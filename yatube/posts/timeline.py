@@ -0,0 +1,315 @@
+import heapq
+from itertools import islice
+
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from core.stampede import get_or_compute
+
+from .constants import fanout_limit, fanout_resume_limit, timeline_batch_size
+from .models import Follow, Post, TimelineEntry, UserStats
+
+PULL_AUTHORS_KEY = 'timeline:pull_authors'
+PULL_AUTHORS_TIMEOUT = 60 * 10
+TIMELINE_KEY = ('timeline_date', 'timeline_post')
+
+
+def _bulk_insert(entries):
+    """Вставляет записи ленты пачками, не держа их все в памяти."""
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, timeline_batch_size))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def get_pull_authors():
+    """Авторы, чьи посты не раскладываются по лентам, а читаются напрямую."""
+    return get_or_compute(
+        PULL_AUTHORS_KEY,
+        lambda: set(UserStats.objects.filter(
+            timeline_pull=True
+        ).values_list('user_id', flat=True)),
+        PULL_AUTHORS_TIMEOUT
+    )
+
+
+def mark_pull_authors(author_ids):
+    """Переводит на чтение при запросе авторов, набравших fanout_limit."""
+    heavy = Follow.objects.filter(
+        author_id__in=list(author_ids)
+    ).values('author').annotate(
+        followers=Count('user')
+    ).filter(
+        followers__gte=fanout_limit
+    ).values_list('author', flat=True)
+    if UserStats.objects.filter(
+        user_id__in=list(heavy), timeline_pull=False
+    ).update(timeline_pull=True):
+        cache.delete(PULL_AUTHORS_KEY)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if UserStats.objects.filter(
+        user_id=post.author_id, timeline_pull=True
+    ).exists():
+        return
+    followers = Follow.objects.filter(author_id=post.author_id)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.values_list('user_id', flat=True).iterator()
+    )
+
+
+def post_moved(post):
+    """Пост сменил автора: записи в лентах переходят к его подписчикам."""
+    TimelineEntry.objects.filter(post=post).delete()
+    fan_out(post)
+
+
+def backfill(user_ids, author_id, until_pk=None, since_pk=None):
+    """
+    Добавляет посты автора в ленты указанных пользователей;
+    until_pk и since_pk ограничивают их постами с id не больше
+    и больше заданного.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    posts = Post.objects.filter(author_id=author_id)
+    if until_pk is not None:
+        posts = posts.filter(pk__lte=until_pk)
+    if since_pk is not None:
+        posts = posts.filter(pk__gt=since_pk)
+    posts = posts.values_list('pk', 'pub_date')
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+        for user_id in user_ids
+    )
+
+
+def fan_out_since(post_pk):
+    """Раскладывает по лентам все посты с id больше post_pk."""
+    rows = Post.objects.filter(
+        pk__gt=post_pk, author__following__isnull=False
+    ).exclude(
+        author_id__in=get_pull_authors()
+    ).values_list('pk', 'pub_date', 'author__following__user_id')
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date, user_id in rows.iterator()
+    )
+
+
+def on_follow(follow):
+    author = UserStats.objects.filter(user_id=follow.author_id)
+    followers = Follow.objects.filter(author_id=follow.author_id).count()
+    if followers >= fanout_limit:
+        if author.filter(timeline_pull=False).update(timeline_pull=True):
+            cache.delete(PULL_AUTHORS_KEY)
+        return
+    if not author.filter(timeline_pull=True).exists():
+        backfill([follow.user_id], follow.author_id)
+
+
+def on_unfollow(follow):
+    # Автор, ставший легче, остается "тяжелым", пока его ленты
+    # не заполнит resume_fan_out: в запросе это слишком долго.
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id
+    ).delete()
+
+
+def resumable_authors():
+    """Авторы без раскладки, у которых подписчиков меньше порога возврата."""
+    return UserStats.objects.filter(
+        timeline_pull=True, followers_count__lt=fanout_resume_limit
+    ).values_list('user_id', flat=True)
+
+
+def resume_fan_out(author_id):
+    """
+    Возвращает автора к раскладке: флаг снимается только после того,
+    как ленты подписчиков заполнены, чтобы они не пустели.
+    """
+    followers = Follow.objects.filter(author_id=author_id)
+    user_ids = set(followers.values_list('user_id', flat=True))
+    last_pk = Post.objects.filter(
+        author_id=author_id
+    ).order_by('-pk').values_list('pk', flat=True).first() or 0
+    backfill(user_ids, author_id, until_pk=last_pk)
+    UserStats.objects.filter(user_id=author_id).update(timeline_pull=False)
+    cache.delete(PULL_AUTHORS_KEY)
+    # Пока шло заполнение, fan_out и on_follow пропускали автора.
+    current = set(followers.values_list('user_id', flat=True))
+    backfill(current - user_ids, author_id, until_pk=last_pk)
+    backfill(current, author_id, since_pk=last_pk)
+
+
+class MergedTimeline:
+    """
+    Лента подписок с авторами, чьи посты читаются при запросе.
+
+    entries - упорядоченный queryset по материализованной ленте,
+    pulled - такие же querysets по каждому "тяжелому" автору, posts -
+    queryset, которым дочитываются их посты. Фильтры и сортировка
+    применяются к entries и pulled, select_related и only - к entries
+    и posts. Срез [:n] читает из каждой части не больше n строк по ее
+    индексу: id постов всех авторов собираются одним UNION ALL,
+    а строки сливаются в Python по полям сортировки, которые должны
+    идти в одном направлении.
+    """
+    ordered = True
+
+    def __init__(self, entries, pulled, posts, ordering, low=0, high=None):
+        self.entries = entries
+        self.pulled = pulled
+        self.posts = posts
+        self.ordering = ordering
+        self.low = low
+        self.high = high
+        self._result = None
+
+    def _clone(self, **changes):
+        state = dict(
+            entries=self.entries, pulled=self.pulled, posts=self.posts,
+            ordering=self.ordering, low=self.low, high=self.high,
+        )
+        state.update(changes)
+        return MergedTimeline(**state)
+
+    def _filtered(self, method, *args, **kwargs):
+        return self._clone(
+            entries=getattr(self.entries, method)(*args, **kwargs),
+            pulled=[
+                getattr(part, method)(*args, **kwargs)
+                for part in self.pulled
+            ],
+        )
+
+    def _loaded(self, method, *args, **kwargs):
+        return self._clone(
+            entries=getattr(self.entries, method)(*args, **kwargs),
+            posts=getattr(self.posts, method)(*args, **kwargs),
+        )
+
+    def filter(self, *args, **kwargs):
+        return self._filtered('filter', *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self._filtered('exclude', *args, **kwargs)
+
+    def order_by(self, *fields):
+        merged = self._filtered('order_by', *fields)
+        merged.ordering = fields
+        return merged
+
+    def select_related(self, *fields):
+        return self._loaded('select_related', *fields)
+
+    def only(self, *fields):
+        return self._loaded('only', *fields)
+
+    def _bounded(self, queryset):
+        return queryset if self.high is None else queryset[:self.high]
+
+    def _pulled_posts(self):
+        queries, params = [], []
+        for part in self.pulled:
+            sql, part_params = self._bounded(
+                part.values('id')
+            ).query.sql_with_params()
+            # Обертка нужна SQLite: LIMIT внутри UNION ALL недопустим.
+            queries.append(f'SELECT * FROM ({sql})')
+            params.extend(part_params)
+        # RawSQL в id__in дал бы IN ((...)), то есть одно значение.
+        return self.posts.extra(
+            where=[f'"posts_post"."id" IN ({" UNION ALL ".join(queries)})'],
+            params=params,
+        ).order_by()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step:
+            return self._fetch()[index]
+        low, high = self.low, self.high
+        if index.stop is not None:
+            stop = low + index.stop
+            high = stop if high is None else min(high, stop)
+        if index.start is not None:
+            low += index.start
+        if high is not None:
+            low = min(low, high)
+        return self._clone(low=low, high=high)
+
+    def _fetch(self):
+        if self._result is None:
+            fields = [field.lstrip('-') for field in self.ordering]
+
+            def key(row):
+                return [getattr(row, field) for field in fields]
+
+            reverse = self.ordering[0].startswith('-')
+            rows = heapq.merge(
+                self._bounded(self.entries),
+                sorted(self._pulled_posts(), key=key, reverse=reverse),
+                key=key, reverse=reverse
+            )
+            self._result = list(islice(rows, self.low, self.high))
+        return self._result
+
+    def __iter__(self):
+        return iter(self._fetch())
+
+    def __len__(self):
+        return len(self._fetch())
+
+    def count(self):
+        if self._result is not None:
+            return len(self._result)
+        total = (
+            self._bounded(self.entries.values('pk').order_by()).count()
+            + self._pulled_posts().values('pk').count()
+        )
+        if self.high is not None:
+            total = min(total, self.high)
+        return max(total - self.low, 0)
+
+
+def get_timeline(user):
+    """
+    Лента подписок пользователя, упорядоченная по TIMELINE_KEY.
+
+    Обычно это чтение диапазона индекса по TimelineEntry; если среди
+    подписок есть авторы с огромным числом подписчиков, к ней
+    подмешиваются чтения по индексу (author, pub_date) каждого из них,
+    см. MergedTimeline.
+    """
+    pull_authors = get_pull_authors()
+    if pull_authors:
+        pull_authors = list(Follow.objects.filter(
+            user=user, author_id__in=pull_authors
+        ).values_list('author_id', flat=True))
+    posts = Post.objects.select_related('author', 'group')
+    ordering = tuple(f'-{field}' for field in TIMELINE_KEY)
+    entries = posts.filter(
+        timeline_entries__user=user
+    ).annotate(
+        timeline_date=F('timeline_entries__pub_date'),
+        timeline_post=F('timeline_entries__post_id'),
+    ).order_by(*ordering)
+    if not pull_authors:
+        return entries
+    # Записи, разложенные до того, как автор стал "тяжелым",
+    # отбрасываются, чтобы части ленты не пересекались.
+    posts = posts.annotate(timeline_date=F('pub_date'), timeline_post=F('id'))
+    return MergedTimeline(
+        entries.exclude(author_id__in=pull_authors),
+        [
+            posts.filter(author_id=author_id).order_by(*ordering)
+            for author_id in pull_authors
+        ],
+        posts, ordering
+    )
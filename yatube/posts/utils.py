@@ -1,10 +1,278 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
 
-from .constants import limitation
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
+from core.stampede import get_or_compute
 
-def get_page(posts, request):
-    paginator = Paginator(posts, limitation)
+from .constants import comments_limit, limitation
+from .timeline import MergedTimeline
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, pub_date, pk):
+    """Упаковывает позицию (pub_date, id) в непрозрачный токен."""
+    raw = f'{direction}|{pub_date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (direction, pub_date, pk) или None для битого токена."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset-паджинатор по (pub_date, id): вместо COUNT(*) и OFFSET
+    каждая страница читается одним запросом по индексу,
+    поэтому стоимость не зависит от глубины.
+
+    Номера страниц виртуальные (1 или 2, плюс следующая), чтобы
+    методы стандартного Page работали без подсчета строк.
+    Ключ можно переопределить парой полей или аннотаций,
+    значения которых совпадают с (pub_date, id).
+    """
+    is_cursor = True
+    key = ('pub_date', 'id')
+
+    def __init__(self, object_list, per_page, key=None, **kwargs):
+        if key is not None:
+            self.key = key
+        date_field, pk_field = self.key
+        super().__init__(
+            object_list.order_by(f'-{date_field}', f'-{pk_field}'),
+            per_page, **kwargs
+        )
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._has_next = False
+        self._has_previous = False
+
+    @cached_property
+    def count(self):
+        return None
+
+    @property
+    def num_pages(self):
+        return 1 + self._has_previous + self._has_next
+
+    def _encode(self, direction, row):
+        return encode_cursor(
+            direction, *(getattr(row, field) for field in self.key)
+        )
+
+    def state(self):
+        """Состояние навигации, достаточное для восстановления страницы."""
+        return {
+            'next_cursor': self.next_cursor,
+            'previous_cursor': self.previous_cursor,
+            'has_next': self._has_next,
+            'has_previous': self._has_previous,
+        }
+
+    def restore_page(self, state, rows):
+        """Собирает страницу из сохраненного состояния и готовых строк."""
+        self.next_cursor = state['next_cursor']
+        self.previous_cursor = state['previous_cursor']
+        self._has_next = state['has_next']
+        self._has_previous = state['has_previous']
+        return self._get_page(rows, 1 + self._has_previous, self)
+
+    def cursor_page(self, token):
+        """Возвращает страницу, начинающуюся после позиции из токена."""
+        position = decode_cursor(token)
+        queryset = self.object_list
+        size = self.per_page
+        date_field, pk_field = self.key
+        if position is None:
+            rows = list(queryset[:size + 1])
+            self._has_next = len(rows) > size
+            rows = rows[:size]
+        else:
+            direction, pub_date, pk = position
+            if direction == NEXT:
+                # Внешняя граница по дате дает индексу диапазон,
+                # иначе OR превращается в полный обход.
+                rows = list(queryset.filter(
+                    Q(**{f'{date_field}__lte': pub_date}),
+                    Q(**{f'{date_field}__lt': pub_date})
+                    | Q(**{f'{pk_field}__lt': pk}),
+                )[:size + 1])
+                self._has_next = len(rows) > size
+                self._has_previous = True
+                rows = rows[:size]
+            else:
+                # Внешняя граница по дате дает индексу диапазон,
+                # иначе OR превращается в полный обход.
+                rows = list(queryset.filter(
+                    Q(**{f'{date_field}__gte': pub_date}),
+                    Q(**{f'{date_field}__gt': pub_date})
+                    | Q(**{f'{pk_field}__gt': pk}),
+                ).order_by(date_field, pk_field)[:size + 1])
+                self._has_previous = len(rows) > size
+                self._has_next = True
+                rows = rows[:size][::-1]
+        if rows:
+            if self._has_next:
+                self.next_cursor = self._encode(NEXT, rows[-1])
+            if self._has_previous:
+                self.previous_cursor = self._encode(PREVIOUS, rows[0])
+        else:
+            self._has_next = False
+            self._has_previous = position is not None
+        return self._get_page(rows, 1 + self._has_previous, self)
+
+
+class WindowedPage(Page):
+    # Для страниц за границей подсчета: прочиталась ли строка сверх них.
+    has_more = False
+
+    def has_next(self):
+        if self.paginator.count_is_estimate:
+            return self.has_more
+        return super().has_next()
+
+    @property
+    def window(self):
+        return self.paginator.page_window(self.number, self.has_next())
+
+
+class WindowedPaginator(Paginator):
+    """
+    Паджинатор по номерам страниц для ссылок ?page=N.
+
+    Число строк считается не дальше count_limit: для огромной ленты
+    count_is_estimate говорит, что последняя страница неизвестна.
+    Тогда страница читается со строкой сверх нее, чтобы знать, есть ли
+    следующая, номера за границей тоже принимаются, а пустая
+    страница отдает 404. С count_key
+    результат подсчета кэшируется; ключ должен меняться при записи
+    (например, включать поколение ленты). В шаблон вместо всех
+    номеров идет окно page_window вокруг текущей страницы.
+    """
+    is_cursor = False
+    # Соседних страниц по каждую сторону от текущей.
+    window = 2
+    count_limit = limitation * 1000
+    count_timeout = 60 * 5
+
+    def __init__(self, object_list, per_page, count_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.count_is_estimate = False
+
+    def _count(self):
+        if not isinstance(self.object_list, (QuerySet, MergedTimeline)):
+            return len(self.object_list), False
+        rows = self.object_list
+        if isinstance(rows, QuerySet):
+            # Порядок и аннотации подсчету не нужны, а с ними SQLite
+            # группирует и сортирует строки во временном B-дереве.
+            rows = rows.values('pk').order_by()
+        # COUNT(*) по подзапросу с LIMIT: дальше границы не считаем.
+        count = rows[:self.count_limit + 1].count()
+        if count > self.count_limit:
+            return self.count_limit, True
+        return count, False
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            count, self.count_is_estimate = self._count()
+        else:
+            count, self.count_is_estimate = get_or_compute(
+                self.count_key, self._count, self.count_timeout
+            )
+        return count
+
+    def _get_page(self, *args, **kwargs):
+        return WindowedPage(*args, **kwargs)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.count_is_estimate or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_estimate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('Страница пуста')
+        page = self._get_page(rows[:self.per_page], number, self)
+        page.has_more = len(rows) > self.per_page
+        return page
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            # За границей подсчета: подставить последнюю страницу нельзя.
+            raise Http404('Нет такой страницы')
+
+    def page_window(self, number, has_next=False):
+        """
+        Номера страниц для навигации: первая, окно вокруг number
+        и последняя, если она известна; None обозначает пропуск.
+        """
+        last = self.num_pages
+        if self.count_is_estimate:
+            last = max(last, number + has_next)
+        start = max(1, number - self.window)
+        end = min(last, number + self.window)
+        pages = list(range(start, end + 1))
+        if start > 1:
+            pages[:0] = [1] if start == 2 else [1, None]
+        if self.count_is_estimate:
+            if has_next:
+                # Дальше страницы есть, но их номера неизвестны.
+                pages.append(None)
+        elif end < last:
+            pages += [last] if end == last - 1 else [None, last]
+        return pages
+
+
+def get_page(posts, request, key=None, count_key=None):
     page_number = request.GET.get('page')
+    if page_number is None:
+        paginator = CursorPaginator(posts, limitation, key=key)
+        return paginator.cursor_page(request.GET.get('cursor'))
+    # Совместимость со старыми ссылками вида ?page=N.
+    paginator = WindowedPaginator(posts, limitation, count_key=count_key)
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def get_comment_page(comments, token):
+    """
+    Страница комментариев, новые сверху, по индексу (post, created, id);
+    следующая страница подгружается по курсору next_cursor.
+    """
+    paginator = CursorPaginator(
+        comments.select_related('author'), comments_limit,
+        key=('created', 'id')
+    )
+    return paginator.cursor_page(token)
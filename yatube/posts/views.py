@@ -1,55 +1,194 @@
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.shortcuts import render, get_object_or_404
 from django.shortcuts import redirect
+from django.urls import reverse
+
+from core.db import run_write
+from core.queries import query_budget
 
-from .models import Post, Group, User, Follow
+from . import counters, hits
+from .models import Comment, Post, Group, User, Follow
+from .conditional import (add_validators, listing_validators, make_etag,
+                          not_modified, public_last_modified)
+from .constants import limitation
+from .feeds import feed_response
 from .forms import PostForm, CommentForm
-from .utils import get_page
+from .listings import get_listing_page
+from .search import search_posts
+from .timeline import TIMELINE_KEY, get_timeline
+from .utils import WindowedPaginator, get_comment_page, get_page
 
 
+@query_budget(4)
 def index(request):
     template = 'posts/index.html'
-    page_obj = get_page(Post.objects.all(), request)
+    validators = listing_validators(request, 'index')
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+    page_obj = get_listing_page(Post.objects.all(), request, 'index')
     context = {'page_obj': page_obj}
-    return render(request, template, context, page_obj)
+    return add_validators(render(request, template, context), *validators)
 
 
+@query_budget(5)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    page_obj = get_page(group.posts.all(), request)
+    listing = f'group:{group.pk}'
+    validators = listing_validators(
+        request, listing, group.title, group.description
+    )
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+    page_obj = get_listing_page(group.posts.all(), request, listing)
     context = {
         'group': group,
         'page_obj': page_obj,
     }
-    return render(request, template, context, page_obj)
+    return add_validators(render(request, template, context), *validators)
 
 
+# 5 запросов, еще 2 - если строку счетчиков автора нужно восстановить.
+@query_budget(7)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = get_page(posts, request)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    listing = f'author:{author.pk}'
+    stats = counters.stats_for(author)
+    validators = listing_validators(
+        request, listing, author.get_full_name(), stats.posts_count,
+        stats.followers_count, stats.following_count, stats.views_count
+    )
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
+    page_obj = get_listing_page(author.posts.all(), request, listing)
     context = {
         'author': author,
         'page_obj': page_obj,
     }
-    return render(request, template, context, page_obj)
+    return add_validators(render(request, template, context), *validators)
+
+
+@query_budget(3)
+def feed(request, kind):
+    return feed_response(
+        request, kind, 'index', Post.objects.all(),
+        title='Yatube: последние посты', link=reverse('posts:index')
+    )
 
 
+@query_budget(4)
+def group_feed(request, slug, kind):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(
+        request, kind, f'group:{group.pk}', group.posts.all(),
+        title=f'Yatube: {group.title}',
+        link=reverse('posts:group_list', args=[slug]),
+        description=group.description
+    )
+
+
+@query_budget(4)
+def profile_feed(request, username, kind):
+    author = get_object_or_404(User, username=username)
+    return feed_response(
+        request, kind, f'author:{author.pk}', author.posts.all(),
+        title=f'Yatube: {author.get_full_name() or author.username}',
+        link=reverse('posts:profile', args=[username])
+    )
+
+
+@query_budget(6)
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    paginator = WindowedPaginator(search_posts(query), limitation)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, template, context)
+
+
+@query_budget(4)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group').annotate(
+            last_comment=Subquery(Comment.objects.filter(
+                post=OuterRef('pk')
+            ).order_by('-created').values('created')[:1]),
+            views_count=Coalesce('stats__views_count', 0),
+        ),
+        id=post_id
+    )
+    hits.record(post)
+    last_modified = max(filter(None, (post.updated, post.last_comment)))
+    validators = (
+        make_etag(
+            request, post.updated, post.comments_count, post.last_comment,
+            post.author.get_full_name(),
+            counters.stats_for(post.author).posts_count,
+            post.group and post.group.title, post.views_count
+        ),
+        public_last_modified(request, int(last_modified.timestamp())),
+    )
+    response = not_modified(request, *validators)
+    if response is not None:
+        return response
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = get_comment_page(post.comments.all(), request.GET.get('cursor'))
     context = {
         'post': post,
         'form': form,
         'comments': comments,
     }
+    return add_validators(render(request, template, context), *validators)
+
+
+@query_budget(2)
+def post_comments(request, post_id):
+    """HTML-фрагмент со следующей страницей комментариев."""
+    template = 'posts/includes/comments.html'
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = get_comment_page(post.comments.all(), request.GET.get('cursor'))
+    context = {
+        'post': post,
+        'comments': comments,
+    }
     return render(request, template, context)
 
 
+def _save_post(post):
+    """
+    Сохраняет пост через run_write. Картинка пишется в хранилище
+    один раз до транзакции: повтор записи после «database is locked»
+    не плодит копий файла, а при окончательной ошибке файл удаляется.
+    """
+    image = post.image
+    uploaded = bool(image) and not image._committed
+    if uploaded:
+        image.save(image.name, image.file, save=False)
+    try:
+        run_write(post.save)
+    except Exception:
+        if uploaded:
+            image.delete(save=False)
+        raise
+
+
+@query_budget(8)
 @login_required
 def post_create(request):
     template = 'posts/post_create.html'
@@ -60,16 +199,17 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        _save_post(post)
         return redirect('posts:profile', request.user.username)
     return render(request, template, context)
 
 
+@query_budget(8)
 @login_required
 def post_edit(request, post_id):
     templates = 'posts:post_detail'
     post = get_object_or_404(Post, id=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.pk:
         return redirect(templates, post_id=post_id)
     form = PostForm(
         request.POST or None,
@@ -77,7 +217,7 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        _save_post(form.save(commit=False))
         return redirect(templates, post_id=post_id)
     context = {
         'post': post,
@@ -87,6 +227,7 @@ def post_edit(request, post_id):
     return render(request, 'posts/post_create.html', context)
 
 
+@query_budget(7)
 @login_required
 def add_comment(request, post_id):
     template = 'posts:post_detail'
@@ -97,17 +238,16 @@ def add_comment(request, post_id):
     comment = form.save(commit=False)
     comment.post = post
     comment.author = request.user
-    comment.save()
+    run_write(comment.save)
     return redirect(template, post_id=post.id)
 
 
+@query_budget(6)
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(
-        author__following__user=request.user
-    )
-    page_obj = get_page(posts, request)
+    posts = get_timeline(request.user)
+    page_obj = get_page(posts, request, key=TIMELINE_KEY)
     context = {
         'page_obj': page_obj,
         'posts': posts
@@ -115,16 +255,20 @@ def follow_index(request):
     return render(request, template, context)
 
 
+@query_budget(14)
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(author=author, user=request.user)
+        run_write(
+            Follow.objects.get_or_create, author=author, user=request.user
+        )
     return redirect('posts:profile', username)
 
 
+@query_budget(10)
 @login_required
 def profile_unfollow(request, username):
-    Follow.objects.filter(
-        user=request.user, author__username=username).delete()
+    run_write(Follow.objects.filter(
+        user=request.user, author__username=username).delete)
     return redirect("posts:profile", username)
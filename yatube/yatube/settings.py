@@ -46,10 +46,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryBudgetMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -92,6 +96,39 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: YATUBE_REPLICAS=2 добавляет replica1
+# и replica2 рядом с основной базой. Локально их наполняет
+# команда replicate, копируя основную базу (core.routers).
+# Тесты запускаются без реплик: TestCase не видит свои данные
+# через отдельное подключение зеркала.
+DATABASE_REPLICAS = []
+for number in range(1, int(os.getenv('YATUBE_REPLICAS', 0)) + 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной базы.
+REPLICA_PIN_SECONDS = 5
+
+# Прагмы для каждого подключения к SQLite (core.db.apply_pragmas).
+# WAL пускает читателей параллельно с писателем, busy_timeout
+# заставляет писателя ждать блокировку, а не сразу падать.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+# Повторы записи при «database is locked» (core.db.run_write).
+SQLITE_WRITE_ATTEMPTS = 5
+SQLITE_WRITE_BACKOFF = 0.05
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -145,5 +182,24 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+# Сколько секунд после истечения значение еще отдается, пока один
+# запрос пересчитывает его (core.stampede.get_or_compute).
+CACHE_STALE_GRACE = 60
+
+# Потоки, в которых миниатюры строятся сразу после загрузки картинки.
+# При 0 они строятся в том же потоке после отдачи ответа.
+THUMBNAIL_WORKERS = 2
+
+# Просмотры постов копятся в памяти процесса и пишутся в базу пачкой,
+# когда их набралось столько или прошло столько секунд (posts.hits).
+VIEW_COUNTER_FLUSH_SIZE = 100
+VIEW_COUNTER_FLUSH_INTERVAL = 10
+
+# Профили запросов (core.middleware.ProfilingMiddleware).
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_SAMPLE_RATE = 0
+PROFILING_KEEP = 50
+# Сколько секунд действует токен для заголовка X-Profile.
+PROFILING_TOKEN_MAX_AGE = 60 * 60
 
 sorting_number = 10
@@ -0,0 +1,47 @@
+"""
+Настройки боевого окружения:
+DJANGO_SETTINGS_MODULE=yatube.settings_production.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, TEMPLATES
+
+DEBUG = False
+
+# Шаблоны разбираются один раз на процесс, а не при каждом рендеринге.
+TEMPLATES = [
+    dict(
+        TEMPLATES[0],
+        APP_DIRS=False,
+        OPTIONS=dict(
+            TEMPLATES[0]['OPTIONS'],
+            loaders=[(
+                'django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ],
+            )],
+        ),
+    ),
+]
+# Все шаблоны компилируются при старте (см. core.apps).
+TEMPLATE_WARMUP = True
+
+# Кэш общий для всех процессов: LRU в памяти перед файлом SQLite.
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 2000,
+            'LOCAL_TIMEOUT': 5,
+            'CHECK_INTERVAL': 1,
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}